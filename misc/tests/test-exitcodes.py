@@ -32,6 +32,8 @@ TRANSLATE_TESTS = [
         lambda: returncodes.TRANSLATE_OUT_OF_MEMORY,
         darwin=returncodes.DRIVER_UNSUPPORTED,
         win32=returncodes.DRIVER_UNSUPPORTED)),
+    ("large", [], ["--translate-options", "--grounding-size-limit", "1000"],
+        defaultdict(lambda: returncodes.TRANSLATE_GROUNDING_TOO_LARGE)),
 ]
 
 SEARCH_TASKS = {
@@ -161,7 +163,7 @@ def test_translator_exit_codes(task_type, driver_options, translate_options, exp
     relpath = TRANSLATE_TASKS[task_type]
     problem = os.path.join(BENCHMARKS_DIR, relpath)
     cmd = ([sys.executable, DRIVER] + driver_options +
-        ["--translate"] + translate_options + [problem])
+        ["--translate", problem] + translate_options)
     print("\nRun {cmd}:".format(**locals()))
     sys.stdout.flush()
     exitcode = subprocess.call(cmd)
@@ -0,0 +1,181 @@
+"""
+Check that the translator keeps the actions, axioms and goals that the
+simplifications of the Datalog program must not remove, on small tasks
+whose solutions use them.
+"""
+
+import os
+import subprocess
+import sys
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+TRANSLATE = os.path.join(REPO, "src", "translate", "translate.py")
+
+
+def translate(tmp_path, domain, problem, *options):
+    """Translate the task and return the translator output and the SAS
+    file contents."""
+    domain_file = tmp_path / "domain.pddl"
+    problem_file = tmp_path / "problem.pddl"
+    sas_file = tmp_path / "output.sas"
+    domain_file.write_text(domain)
+    problem_file.write_text(problem)
+    output = subprocess.check_output(
+        [sys.executable, TRANSLATE, str(domain_file), str(problem_file),
+         "--sas-file", str(sas_file)] + list(options),
+        encoding="utf-8")
+    return output, sas_file.read_text()
+
+
+def get_num_operators(sas):
+    lines = sas.splitlines()
+    return int(lines[lines.index("end_goal") + 1])
+
+
+def test_action_without_parameters_and_precondition(tmp_path):
+    # The rule for the action has an empty body and becomes a fact.
+    output, sas = translate(tmp_path, """
+(define (domain empty-precondition)
+  (:predicates (g))
+  (:action achieve
+    :parameters ()
+    :precondition (and)
+    :effect (g)))
+""", """
+(define (problem p1) (:domain empty-precondition)
+  (:init)
+  (:goal (g)))
+""")
+    assert "trivially false goal" not in output
+    assert "achieve" in sas
+    assert get_num_operators(sas) == 1
+
+
+def test_goal_with_only_negative_literals(tmp_path):
+    # The rule for @goal-reachable has an empty body and becomes a fact.
+    output, sas = translate(tmp_path, """
+(define (domain negative-goal)
+  (:predicates (p ?o))
+  (:action clear
+    :parameters (?o)
+    :precondition (and)
+    :effect (not (p ?o))))
+""", """
+(define (problem p2) (:domain negative-goal)
+  (:objects a)
+  (:init (p a))
+  (:goal (not (p a))))
+""")
+    assert "No relaxed solution" not in output
+    assert "clear a" in sas
+    assert get_num_operators(sas) == 1
+
+
+NEGATED_AXIOM_PROBLEM = """
+(define (problem p) (:domain negated-axiom)
+  (:init (obstacle) (ready))
+  (:goal (done)))
+"""
+
+
+def test_pruning_keeps_deleters_for_negated_axioms(tmp_path):
+    # (not (blocked)) only becomes true when remove deletes (obstacle).
+    domain = """
+(define (domain negated-axiom)
+  (:predicates (obstacle) (ready) (blocked) (done))
+  (:derived (blocked) (obstacle))
+  (:action remove
+    :parameters ()
+    :precondition (obstacle)
+    :effect (not (obstacle)))
+  (:action finish
+    :parameters ()
+    :precondition (and (ready) (not (blocked)))
+    :effect (done)))
+"""
+    _, sas = translate(tmp_path, domain, NEGATED_AXIOM_PROBLEM)
+    _, pruned_sas = translate(
+        tmp_path, domain, NEGATED_AXIOM_PROBLEM, "--prune-goal-irrelevant")
+    assert get_num_operators(sas) == 2
+    assert pruned_sas == sas
+
+
+def test_pruning_keeps_adders_for_negated_axioms(tmp_path):
+    # (not (blocked)) only becomes true when unblock adds (free).
+    domain = """
+(define (domain negated-axiom)
+  (:predicates (obstacle) (free) (ready) (blocked) (done))
+  (:derived (blocked) (not (free)))
+  (:action unblock
+    :parameters ()
+    :precondition (obstacle)
+    :effect (free))
+  (:action finish
+    :parameters ()
+    :precondition (and (ready) (not (blocked)))
+    :effect (done)))
+"""
+    _, sas = translate(tmp_path, domain, NEGATED_AXIOM_PROBLEM)
+    _, pruned_sas = translate(
+        tmp_path, domain, NEGATED_AXIOM_PROBLEM, "--prune-goal-irrelevant")
+    assert get_num_operators(sas) == 2
+    assert pruned_sas == sas
+
+
+def test_stratified_evaluation_of_cyclic_component(tmp_path):
+    # The component of p and q only depends on its own predicates.
+    domain = """
+(define (domain flip-flop)
+  (:predicates (p) (q) (g))
+  (:action flip
+    :parameters ()
+    :precondition (p)
+    :effect (q))
+  (:action flop
+    :parameters ()
+    :precondition (q)
+    :effect (and (p) (g))))
+"""
+    problem = """
+(define (problem p3) (:domain flip-flop)
+  (:init (p))
+  (:goal (g)))
+"""
+    _, sas = translate(tmp_path, domain, problem)
+    for jobs in ["1", "2"]:
+        _, stratified_sas = translate(
+            tmp_path, domain, problem,
+            "--datalog-evaluation", "stratified", "--jobs", jobs)
+        assert stratified_sas == sas
+    assert get_num_operators(sas) == 2
+
+
+def get_num_queue_pushes(output):
+    for line in output.splitlines():
+        if line.endswith(" total queue pushes"):
+            return int(line.split()[0])
+
+
+def test_static_atoms_do_not_enter_the_queue(tmp_path):
+    # The precondition only uses the static predicate e. Its atoms and
+    # the precomputed join of the two conditions must not be queued, so
+    # that only the 6 actions, their effects and @goal-reachable are.
+    domain = """
+(define (domain static-join)
+  (:predicates (e ?a ?b) (visited ?a))
+  (:action go
+    :parameters (?a ?b ?c)
+    :precondition (and (e ?a ?b) (e ?b ?c))
+    :effect (visited ?c)))
+"""
+    problem = """
+(define (problem p4) (:domain static-join)
+  (:objects a b c d)
+  (:init (e a b) (e b c) (e c d) (e b d) (e d a))
+  (:goal (visited a)))
+"""
+    for evaluation in ["worklist", "batched", "stratified"]:
+        output, _ = translate(
+            tmp_path, domain, problem, "--datalog-evaluation", evaluation)
+        assert get_num_queue_pushes(output) == 2 * 6 + 1
@@ -0,0 +1,83 @@
+#! /usr/bin/env python3
+
+HELP = """\
+Check that PropositionalAction separates add and delete effects correctly and
+measure how long this takes for actions with many conditional effects, as they
+arise from expanding universal effects. Run with pytest to check the results
+or as a script to print the measured times.
+"""
+
+import argparse
+import os
+import sys
+import timeit
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+sys.path.insert(0, os.path.join(REPO, "src", "translate"))
+from pddl import Atom, NegatedAtom, PropositionalAction
+
+
+def get_effects(num_effects):
+    # Every object gets a conditional add and delete effect for the same atom,
+    # which cancel out for every second object, as in
+    # (forall (?x) (when (p ?x) (and (q ?x) (not (q ?x))))).
+    effects = []
+    for i in range(num_effects):
+        obj = "obj%d" % i
+        atom = Atom("q", [obj])
+        effects.append(([Atom("p", [obj])], atom))
+        if i % 2:
+            condition = [Atom("p", [obj])]
+        else:
+            condition = [Atom("r", [obj])]
+        effects.append((condition, NegatedAtom("q", [obj])))
+    effects.append(([], NegatedAtom("s", [])))
+    return effects
+
+
+def separate_effects_quadratically(effects):
+    # The previous list-based implementation, used as reference.
+    add_effects = []
+    del_effects = []
+    for condition, effect in effects:
+        if not effect.negated:
+            add_effects.append((condition, effect))
+    for condition, effect in effects:
+        if effect.negated and (condition, effect.negate()) not in add_effects:
+            del_effects.append((condition, effect.negate()))
+    return add_effects, del_effects
+
+
+def test_effect_separation():
+    effects = get_effects(500)
+    action = PropositionalAction("(a)", [], effects, 1)
+    add_effects, del_effects = separate_effects_quadratically(effects)
+    assert action.add_effects == add_effects
+    assert action.del_effects == del_effects
+    assert len(del_effects) == 251
+
+
+def test_many_effects():
+    effects = get_effects(20000)
+    action = PropositionalAction("(a)", [], effects, 1)
+    assert len(action.add_effects) == 20000
+    assert len(action.del_effects) == 10001
+
+
+def main():
+    parser = argparse.ArgumentParser(description=HELP)
+    parser.add_argument(
+        "--repetitions", type=int, default=5,
+        help="number of measurements per action size (default: %(default)d)")
+    args = parser.parse_args()
+    for num_effects in [10, 100, 1000, 10000]:
+        effects = get_effects(num_effects)
+        time = min(timeit.repeat(
+            lambda: PropositionalAction("(a)", [], effects, 1),
+            number=1, repeat=args.repetitions))
+        print("%6d effects: %.6fs" % (len(effects), time))
+
+
+if __name__ == "__main__":
+    main()
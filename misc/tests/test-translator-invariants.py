@@ -0,0 +1,57 @@
+"""
+Check that the translator output does not change when the invariants are
+loaded from the invariant cache, and that different domains do not share
+cache entries.
+"""
+
+import os
+import subprocess
+import sys
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+TRANSLATE = os.path.join(REPO, "src", "translate", "translate.py")
+
+DOMAIN = """
+(define (domain cached-invariants)
+  (:predicates (at ?o ?l) (road ?l1 ?l2) (open ?l))
+  (:action move
+    :parameters (?o ?from ?to)
+    :precondition (and (at ?o ?from) (road ?from ?to) %s)
+    :effect (and (not (at ?o ?from)) (at ?o ?to))))
+"""
+
+PROBLEM = """
+(define (problem p) (:domain cached-invariants)
+  (:objects o l1 l2 l3)
+  (:init (at o l1) (road l1 l2) (road l2 l3) (open l2) (open l3))
+  (:goal (at o l3)))
+"""
+
+
+def translate(tmp_path, domain, cache_dir):
+    domain_file = tmp_path / "domain.pddl"
+    problem_file = tmp_path / "problem.pddl"
+    sas_file = tmp_path / "output.sas"
+    domain_file.write_text(domain)
+    problem_file.write_text(PROBLEM)
+    output = subprocess.check_output(
+        [sys.executable, TRANSLATE, str(domain_file), str(problem_file),
+         "--sas-file", str(sas_file), "--invariant-cache", str(cache_dir)],
+        encoding="utf-8")
+    return output, sas_file.read_text()
+
+
+def test_invariant_cache(tmp_path):
+    cache_dir = tmp_path / "cache"
+    domain = DOMAIN % ""
+    output, sas = translate(tmp_path, domain, cache_dir)
+    assert "Loaded" not in output
+    output, cached_sas = translate(tmp_path, domain, cache_dir)
+    assert "Loaded 1 invariants from cache file" in output
+    assert cached_sas == sas
+
+    # A changed precondition leads to a new cache entry.
+    output, _ = translate(tmp_path, DOMAIN % "(open ?to)", cache_dir)
+    assert "Loaded" not in output
+    assert len(list(cache_dir.iterdir())) == 2
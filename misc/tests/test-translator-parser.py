@@ -0,0 +1,89 @@
+"""
+Check that the PDDL parser reports errors like the line-based parser it
+replaced and that the domain cache does not change its output.
+"""
+
+import os
+import sys
+
+import pytest
+
+DIR = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(os.path.dirname(DIR))
+sys.path.insert(0, os.path.join(REPO, "src", "translate"))
+from pddl_parser import lisp_parser, parsing_functions, pddl_file
+from pddl_parser.parse_error import ParseError
+
+
+def get_parse_error(text):
+    with pytest.raises(ParseError) as excinfo:
+        lisp_parser.parse_nested_list(text.encode("latin-1"))
+    return str(excinfo.value)
+
+
+@pytest.mark.parametrize("chunk_size", [1, lisp_parser.CHUNK_SIZE])
+def test_syntax_errors_before_non_ascii_characters(monkeypatch, chunk_size):
+    monkeypatch.setattr(lisp_parser, "CHUNK_SIZE", chunk_size)
+    # The non-ASCII character is only reported when the tokenizer
+    # reaches its line.
+    assert (get_parse_error("define\n(domain é)\n") ==
+            "Expected '(', got 'define'.")
+    assert (get_parse_error("define (domain é)\n") ==
+            "Non-ASCII character outside comment: define (domain é)")
+    assert (get_parse_error("(a ; é\n b) é\n") ==
+            "Non-ASCII character outside comment:  b) é")
+
+
+def test_domain_cache_repeats_parser_warnings(tmp_path, capsys, monkeypatch):
+    domain_file = tmp_path / "domain.pddl"
+    domain_file.write_text("""
+(define (domain warnings)
+  (:predicates (block ?b) (on ?b1 ?b2))
+  (:types block)
+  (:action stack
+    :parameters (?b1 ?b2)
+    :precondition (block ?b1)
+    :effect (on ?b1 ?b2)))
+""")
+    outputs = []
+    for _ in range(2):
+        monkeypatch.setattr(parsing_functions,
+                            "SEEN_WARNING_TYPE_PREDICATE_NAME_CLASH", False)
+        pddl_file.parse_domain_file(str(domain_file), tmp_path / "cache")
+        outputs.append(capsys.readouterr())
+    assert "Loaded parsed domain" in outputs[1].out
+    assert "not allowed here" in outputs[0].err
+    assert "name clash" in outputs[0].err
+    assert outputs[1].err == outputs[0].err
+    assert parsing_functions.SEEN_WARNING_TYPE_PREDICATE_NAME_CLASH
+
+
+def test_domain_cache_interns_names(tmp_path):
+    domain_file = tmp_path / "domain.pddl"
+    domain_file.write_text("""
+(define (domain interning)
+  (:types block)
+  (:constants table - block)
+  (:predicates (on ?b1 ?b2 - block))
+  (:action put
+    :parameters (?b - block)
+    :precondition (on ?b table)
+    :effect (not (on ?b table))))
+""")
+    parsed_domain = pddl_file.parse_domain_file(str(domain_file))
+    for _ in range(2):
+        cached_domain = pddl_file.parse_domain_file(
+            str(domain_file), tmp_path / "cache")
+    _, _, types, _, constants, predicates, _, _, actions, _ = parsed_domain
+    _, _, cached_types, _, cached_constants, cached_predicates, _, _, \
+        cached_actions, _ = cached_domain
+    assert cached_types[1].name is types[1].name
+    assert cached_constants[0].name is constants[0].name
+    assert cached_predicates[-1].name is predicates[-1].name
+    assert (cached_actions[0].parameters[0].name is
+            actions[0].parameters[0].name)
+    literal = actions[0].precondition
+    cached_literal = cached_actions[0].precondition
+    assert cached_literal.predicate is literal.predicate
+    assert all(cached_arg is arg for cached_arg, arg in
+               zip(cached_literal.args, literal.args))
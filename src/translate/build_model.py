@@ -4,13 +4,22 @@
 import sys
 import itertools
 
+import options
 import pddl
+import sccs
 import timers
+import tools
 from functools import reduce
+from operator import itemgetter
 
-def convert_rules(prog):
+# NumPy is only needed by the batched evaluation and imported on demand in
+# compute_model, because importing it noticeably increases the translator's
+# peak memory usage.
+numpy = None
+
+def convert_rules(prog, symbols, use_numpy=False):
     RULE_TYPES = {
-        "join": JoinRule,
+        "join": NumPyJoinRule if use_numpy else JoinRule,
         "product": ProductRule,
         "project": ProjectRule,
         }
@@ -19,7 +28,7 @@ def convert_rules(prog):
         RuleType = RULE_TYPES[rule.type]
         new_effect, new_conditions = variables_to_numbers(
             rule.effect, rule.conditions)
-        rule = RuleType(new_effect, new_conditions)
+        rule = RuleType(new_effect, new_conditions, symbols)
         rule.validate()
         result.append(rule)
     return result
@@ -29,8 +38,10 @@ def variables_to_numbers(effect, conditions):
     rename_map = {}
     for i, arg in enumerate(effect.args):
         if arg[0] == "?":
-            rename_map[arg] = i
-            new_effect_args[i] = i
+            # A variable that occurs several times in the effect is
+            # numbered by its first position.
+            rename_map.setdefault(arg, i)
+            new_effect_args[i] = rename_map[arg]
     new_effect = pddl.Atom(effect.predicate, new_effect_args)
 
     # There are three possibilities for arguments in conditions:
@@ -50,31 +61,119 @@ def variables_to_numbers(effect, conditions):
         new_conditions.append(pddl.Atom(cond.predicate, new_cond_args))
     return new_effect, new_conditions
 
+class SymbolTable:
+    """Map predicates and objects to consecutive integers.
+
+    While computing the model, we represent each atom as a tuple of
+    integers, where the first entry encodes the predicate and the
+    remaining entries encode the arguments. Predicates and objects share
+    the same numbering; the position in the tuple tells them apart."""
+    def __init__(self):
+        self.symbols = []
+        self.symbol_ids = {}
+    def get_id(self, symbol):
+        symbol_id = self.symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = len(self.symbols)
+            self.symbol_ids[symbol] = symbol_id
+            self.symbols.append(symbol)
+        return symbol_id
+    def encode_atom(self, atom):
+        return (self.get_id(atom.predicate),) + tuple(
+            self.get_id(arg) for arg in atom.args)
+    def decode_atom(self, atom):
+        symbols = self.symbols
+        return pddl.Atom(symbols[atom[0]], [symbols[arg] for arg in atom[1:]])
+
+def get_key_function(positions):
+    # Return a function mapping an atom to the tuple of its arguments at
+    # the given positions or, for a single position, to this argument.
+    if not positions:
+        return lambda atom: ()
+    return itemgetter(*positions)
+
 class BuildRule:
-    def prepare_effect(self, new_atom, cond_index):
-        effect_args = list(self.effect.args)
-        cond = self.conditions[cond_index]
-        for var_no, obj in zip(cond.args, new_atom.args):
+    def __init__(self, effect, conditions, symbols):
+        self.effect = effect
+        self.conditions = conditions
+        # Template for the effect atom, with the variable positions left
+        # open, and, for each condition, the pairs (position in the
+        # condition atom, position in the effect atom) of the variables
+        # bound by the condition. Positions refer to the integer tuples,
+        # where the predicate is stored at position 0.
+        self.effect_template = [symbols.get_id(effect.predicate)] + [
+            None if isinstance(arg, int) else symbols.get_id(arg)
+            for arg in effect.args]
+        effect_positions = {}
+        for effect_pos, var_no in enumerate(effect.args):
             if isinstance(var_no, int):
-                effect_args[var_no] = obj
+                effect_positions.setdefault(var_no, []).append(effect_pos)
+        self.condition_bindings = [
+            [(cond_pos + 1, effect_pos + 1)
+             for cond_pos, var_no in enumerate(cond.args)
+             if isinstance(var_no, int) and
+             cond.args.index(var_no) == cond_pos
+             for effect_pos in effect_positions[var_no]]
+            for cond in conditions]
+        # The predicate and the (position, object) pairs of the constant
+        # arguments that an atom must have to match each condition.
+        self.condition_predicates = [
+            symbols.get_id(cond.predicate) for cond in conditions]
+        self.condition_constants = [
+            [(cond_pos + 1, symbols.get_id(arg))
+             for cond_pos, arg in enumerate(cond.args)
+             if not isinstance(arg, int) and arg[0] != "?"]
+            for cond in conditions]
+        # Equality is built in: a variable that occurs several times in a
+        # condition requires equal objects at these positions. We store
+        # the pairs (first position, other position) for each condition.
+        self.condition_equalities = [
+            [(cond.args.index(arg) + 1, cond_pos + 1)
+             for cond_pos, arg in enumerate(cond.args)
+             if (isinstance(arg, int) or arg[0] == "?") and
+             cond.args.index(arg) != cond_pos]
+            for cond in conditions]
+    def matches(self, atom, cond_index):
+        for pos, obj in self.condition_constants[cond_index]:
+            if atom[pos] != obj:
+                return False
+        for pos1, pos2 in self.condition_equalities[cond_index]:
+            if atom[pos1] != atom[pos2]:
+                return False
+        return True
+    def prepare_effect(self, new_atom, cond_index):
+        effect_args = list(self.effect_template)
+        for cond_pos, effect_pos in self.condition_bindings[cond_index]:
+            effect_args[effect_pos] = new_atom[cond_pos]
         return effect_args
+    def fire_batch(self, new_atoms, cond_index, derived_atoms):
+        # Add all new atoms matching the given condition to the index
+        # and fire the rule for each of them, appending the derived atoms
+        # to the given list. Pairs of new atoms for different conditions
+        # are considered by the later call.
+        for new_atom in new_atoms:
+            self.update_index(new_atom, cond_index)
+        for new_atom in new_atoms:
+            self.fire(new_atom, cond_index, derived_atoms.append)
     def __str__(self):
         return "%s :- %s" % (self.effect, ", ".join(map(str, self.conditions)))
     def __repr__(self):
         return "<%s %s>" % (self.__class__.__name__, self)
 
 class JoinRule(BuildRule):
-    def __init__(self, effect, conditions):
-        self.effect = effect
-        self.conditions = conditions
+    def __init__(self, effect, conditions, symbols):
+        BuildRule.__init__(self, effect, conditions, symbols)
         left_args = conditions[0].args
         right_args = conditions[1].args
         left_vars = {var for var in left_args if isinstance(var, int)}
         right_vars = {var for var in right_args if isinstance(var, int)}
         common_vars = sorted(left_vars & right_vars)
         self.common_var_positions = [
-            [args.index(var) for var in common_vars]
+            [args.index(var) + 1 for var in common_vars]
             for args in (list(left_args), list(right_args))]
+        self.common_var_keys = [
+            get_key_function(positions)
+            for positions in self.common_var_positions]
         self.atoms_by_key = ({}, {})
     def validate(self):
         assert len(self.conditions) == 2, self
@@ -90,30 +189,114 @@ class JoinRule(BuildRule):
         assert left_vars & right_vars, self
         assert (left_vars | right_vars) == (left_vars & right_vars) | eff_vars, self
     def update_index(self, new_atom, cond_index):
-        ordered_common_args = [
-            new_atom.args[position]
-            for position in self.common_var_positions[cond_index]]
-        key = tuple(ordered_common_args)
+        key = self.common_var_keys[cond_index](new_atom)
         self.atoms_by_key[cond_index].setdefault(key, []).append(new_atom)
     def fire(self, new_atom, cond_index, enqueue_func):
         effect_args = self.prepare_effect(new_atom, cond_index)
-        ordered_common_args = [
-            new_atom.args[position]
-            for position in self.common_var_positions[cond_index]]
-        key = tuple(ordered_common_args)
+        key = self.common_var_keys[cond_index](new_atom)
+        other_cond_index = 1 - cond_index
+        other_bindings = self.condition_bindings[other_cond_index]
+        for atom in self.atoms_by_key[other_cond_index].get(key, ()):
+            for cond_pos, effect_pos in other_bindings:
+                effect_args[effect_pos] = atom[cond_pos]
+            enqueue_func(tuple(effect_args))
+    def fire_batch(self, new_atoms, cond_index, derived_atoms):
+        key_function = self.common_var_keys[cond_index]
+        atoms_by_key = self.atoms_by_key[cond_index]
+        for new_atom in new_atoms:
+            atoms_by_key.setdefault(key_function(new_atom), []).append(new_atom)
+        other_atoms_by_key = self.atoms_by_key[1 - cond_index]
+        if not other_atoms_by_key:
+            return
+        other_bindings = self.condition_bindings[1 - cond_index]
+        for new_atom in new_atoms:
+            other_atoms = other_atoms_by_key.get(key_function(new_atom))
+            if other_atoms:
+                effect_args = self.prepare_effect(new_atom, cond_index)
+                for atom in other_atoms:
+                    for cond_pos, effect_pos in other_bindings:
+                        effect_args[effect_pos] = atom[cond_pos]
+                    derived_atoms.append(tuple(effect_args))
+
+class NumPyJoinRule(JoinRule):
+    """Join rule for the batched evaluation that stores the atoms of both
+    conditions as rows of integer arrays sorted by their join key, and
+    joins whole batches of new atoms with vectorized operations."""
+    def __init__(self, effect, conditions, symbols):
+        JoinRule.__init__(self, effect, conditions, symbols)
+        self.symbols = symbols
+        self.rows = [None, None]
+        self.keys = [None, None]
+        self.key_base = None
+        self.keys_fit = True
+    def _get_keys(self, rows, cond_index):
+        # Combine the common variables of each row into one integer.
+        positions = self.common_var_positions[cond_index]
+        keys = numpy.zeros(len(rows), dtype=numpy.int64)
+        for pos in positions:
+            keys *= self.key_base
+            keys += rows[:, pos]
+        return keys
+    def _add_rows(self, new_rows, new_keys, cond_index):
+        rows, keys = self.rows[cond_index], self.keys[cond_index]
+        if rows is not None:
+            new_rows = numpy.concatenate((rows, new_rows))
+            new_keys = numpy.concatenate((keys, new_keys))
+        # The stable sort is fast on the two presorted runs.
+        order = numpy.argsort(new_keys, kind="stable")
+        self.rows[cond_index] = new_rows[order]
+        self.keys[cond_index] = new_keys[order]
+    def fire_batch(self, new_atoms, cond_index, derived_atoms):
+        if self.key_base is None:
+            # No new objects are introduced while computing the model, so
+            # we can encode the join keys with the final number of symbols.
+            self.key_base = len(self.symbols.symbols)
+            num_common_vars = len(self.common_var_positions[0])
+            self.keys_fit = self.key_base ** num_common_vars < 2 ** 63
+        if not self.keys_fit:
+            # Fall back to dictionaries if the keys would overflow.
+            JoinRule.fire_batch(self, new_atoms, cond_index, derived_atoms)
+            return
+        width = len(new_atoms[0])
+        new_rows = numpy.fromiter(
+            itertools.chain.from_iterable(new_atoms), dtype=numpy.int64,
+            count=len(new_atoms) * width).reshape(len(new_atoms), width)
+        new_keys = self._get_keys(new_rows, cond_index)
         other_cond_index = 1 - cond_index
-        other_cond = self.conditions[other_cond_index]
-        for atom in self.atoms_by_key[other_cond_index].get(key, []):
-            for var_no, obj in zip(other_cond.args, atom.args):
-                if isinstance(var_no, int):
-                    effect_args[var_no] = obj
-            enqueue_func(self.effect.predicate, effect_args)
+        other_rows = self.rows[other_cond_index]
+        if other_rows is not None:
+            other_keys = self.keys[other_cond_index]
+            # For each new row, the matching rows of the other condition
+            # form the range [first, last) of the sorted other rows.
+            first = numpy.searchsorted(other_keys, new_keys, side="left")
+            last = numpy.searchsorted(other_keys, new_keys, side="right")
+            counts = last - first
+            num_matches = int(counts.sum())
+            if num_matches:
+                new_index = numpy.repeat(numpy.arange(len(new_rows)), counts)
+                range_starts = numpy.cumsum(counts) - counts
+                other_index = (numpy.repeat(first - range_starts, counts) +
+                               numpy.arange(num_matches))
+                effects = numpy.empty(
+                    (num_matches, len(self.effect_template)),
+                    dtype=numpy.int64)
+                for effect_pos, obj in enumerate(self.effect_template):
+                    if obj is not None:
+                        effects[:, effect_pos] = obj
+                for cond_pos, effect_pos in self.condition_bindings[cond_index]:
+                    effects[:, effect_pos] = new_rows[new_index, cond_pos]
+                for cond_pos, effect_pos in self.condition_bindings[other_cond_index]:
+                    effects[:, effect_pos] = other_rows[other_index, cond_pos]
+                # Zipping the columns directly creates the atom tuples.
+                derived_atoms.extend(zip(*effects.T.tolist()))
+        self._add_rows(new_rows, new_keys, cond_index)
 
 class ProductRule(BuildRule):
-    def __init__(self, effect, conditions):
-        self.effect = effect
-        self.conditions = conditions
-        self.atoms_by_index = [[] for c in self.conditions]
+    def __init__(self, effect, conditions, symbols):
+        BuildRule.__init__(self, effect, conditions, symbols)
+        # For each condition, we keep the bindings of the atoms seen so
+        # far, so that firing the rule doesn't have to recompute them.
+        self.bindings_by_index = [[] for c in self.conditions]
         self.empty_atom_list_no = len(self.conditions)
     def validate(self):
         assert len(self.conditions) >= 2, self
@@ -126,76 +309,83 @@ class ProductRule(BuildRule):
         assert len(all_cond_vars) == len(eff_vars), self
         assert len(all_cond_vars) == sum([len(c) for c in cond_vars])
     def update_index(self, new_atom, cond_index):
-        atom_list = self.atoms_by_index[cond_index]
-        if not atom_list:
+        bindings_factor = self.bindings_by_index[cond_index]
+        if not bindings_factor:
             self.empty_atom_list_no -= 1
-        atom_list.append(new_atom)
+        bindings_factor.append(self._get_bindings(new_atom, cond_index))
 
-    def _get_bindings(self, atom, cond):
-        return [(var_no, obj) for var_no, obj in zip(cond.args, atom.args)
-                if isinstance(var_no, int)]
+    def _get_bindings(self, atom, cond_index):
+        return tuple((effect_pos, atom[cond_pos]) for cond_pos, effect_pos
+                     in self.condition_bindings[cond_index])
 
     def fire(self, new_atom, cond_index, enqueue_func):
         if self.empty_atom_list_no:
             return
 
-        # Binding: a (var_no, object) pair
-        # Bindings: List-of(Binding)
+        # Binding: a (effect_pos, object) pair
+        # Bindings: Tuple-of(Binding)
         # BindingsFactor: List-of(Bindings)
         # BindingsFactors: List-of(BindingsFactor)
-        bindings_factors = []
-        for pos, cond in enumerate(self.conditions):
-            if pos == cond_index:
-                continue
-            atoms = self.atoms_by_index[pos]
-            assert atoms, "if we have no atoms, this should never be called"
-            factor = [self._get_bindings(atom, cond) for atom in atoms]
-            bindings_factors.append(factor)
+        bindings_factors = [
+            bindings_factor
+            for pos, bindings_factor in enumerate(self.bindings_by_index)
+            if pos != cond_index]
 
         eff_args = self.prepare_effect(new_atom, cond_index)
 
+        # The product is streamed, and its size bounds the time needed by
+        # itertools.product to copy the factors.
         for bindings_list in itertools.product(*bindings_factors):
-            bindings = itertools.chain(*bindings_list)
-            for var_no, obj in bindings:
-                eff_args[var_no] = obj
-            enqueue_func(self.effect.predicate, eff_args)
+            for bindings in bindings_list:
+                for effect_pos, obj in bindings:
+                    eff_args[effect_pos] = obj
+            enqueue_func(tuple(eff_args))
 
 
 class ProjectRule(BuildRule):
-    def __init__(self, effect, conditions):
-        self.effect = effect
-        self.conditions = conditions
     def validate(self):
         assert len(self.conditions) == 1
     def update_index(self, new_atom, cond_index):
         pass
     def fire(self, new_atom, cond_index, enqueue_func):
         effect_args = self.prepare_effect(new_atom, cond_index)
-        enqueue_func(self.effect.predicate, effect_args)
+        enqueue_func(tuple(effect_args))
+    def fire_batch(self, new_atoms, cond_index, derived_atoms):
+        for new_atom in new_atoms:
+            derived_atoms.append(
+                tuple(self.prepare_effect(new_atom, cond_index)))
 
 class Unifier:
     def __init__(self, rules):
         self.predicate_to_rule_generator = {}
+        equality_conditions = {}
         for rule in rules:
             for i, cond in enumerate(rule.conditions):
-                self._insert_condition(rule, i)
+                if rule.condition_equalities[i]:
+                    predicate = rule.condition_predicates[i]
+                    equality_conditions.setdefault(predicate, []).append(
+                        (rule, i))
+                else:
+                    self._insert_condition(rule, i)
+        for predicate, conditions in equality_conditions.items():
+            self.predicate_to_rule_generator[predicate] = EqualityGenerator(
+                self.predicate_to_rule_generator.get(predicate), conditions)
     def unify(self, atom):
         result = []
-        generator = self.predicate_to_rule_generator.get(atom.predicate)
+        generator = self.predicate_to_rule_generator.get(atom[0])
         if generator:
             generator.generate(atom, result)
         return result
     def _insert_condition(self, rule, cond_index):
-        condition = rule.conditions[cond_index]
-        root = self.predicate_to_rule_generator.get(condition.predicate)
+        predicate = rule.condition_predicates[cond_index]
+        root = self.predicate_to_rule_generator.get(predicate)
         if not root:
             root = LeafGenerator()
-        constant_arguments = [
-            (arg_index, arg)
-            for (arg_index, arg) in enumerate(condition.args)
-            if not isinstance(arg, int) and arg[0] != "?"]
+        # The indices refer to the positions in the integer tuples
+        # representing atoms, where the predicate is stored at position 0.
+        constant_arguments = rule.condition_constants[cond_index]
         newroot = root._insert(constant_arguments, (rule, cond_index))
-        self.predicate_to_rule_generator[condition.predicate] = newroot
+        self.predicate_to_rule_generator[predicate] = newroot
     def dump(self):
         predicates = sorted(self.predicate_to_rule_generator)
         print("Unifier:")
@@ -204,6 +394,24 @@ class Unifier:
             rule_gen = self.predicate_to_rule_generator[pred]
             rule_gen.dump("    " * 2)
 
+class EqualityGenerator:
+    """Adds the conditions with equality constraints, which we check one
+    by one, to the matches of the wrapped generator (if any)."""
+    def __init__(self, generator, conditions):
+        self.generator = generator
+        self.conditions = conditions
+    def generate(self, atom, result):
+        if self.generator:
+            self.generator.generate(atom, result)
+        for rule, cond_index in self.conditions:
+            if rule.matches(atom, cond_index):
+                result.append((rule, cond_index))
+    def dump(self, indent):
+        if self.generator:
+            self.generator.dump(indent)
+        for match in self.conditions:
+            print("%s%s (with equalities)" % (indent, match))
+
 class LeafGenerator:
     index = sys.maxsize
     def __init__(self):
@@ -239,7 +447,7 @@ class MatchGenerator:
         return False
     def generate(self, atom, result):
         result += self.matches
-        generator = self.match_generator.get(atom.args[self.index])
+        generator = self.match_generator.get(atom[self.index])
         if generator:
             generator.generate(atom, result)
         self.next.generate(atom, result)
@@ -268,7 +476,7 @@ class MatchGenerator:
         for match in self.matches:
             print("%s%s" % (indent, match))
         for key in sorted(self.match_generator.keys()):
-            print("%sargs[%s] == %s:" % (indent, self.index, key))
+            print("%satom[%s] == %s:" % (indent, self.index, key))
             self.match_generator[key].dump(indent + "    ")
         if not self.next.empty():
             assert isinstance(self.next, MatchGenerator)
@@ -279,51 +487,279 @@ class Queue:
     def __init__(self, atoms):
         self.queue = atoms
         self.queue_pos = 0
-        self.enqueued = {(atom.predicate,) + tuple(atom.args)
-                         for atom in self.queue}
+        self.enqueued = set(atoms)
         self.num_pushes = len(atoms)
     def __bool__(self):
         return self.queue_pos < len(self.queue)
     __nonzero__ = __bool__
-    def push(self, predicate, args):
+    def push(self, atom):
         self.num_pushes += 1
-        eff_tuple = (predicate,) + tuple(args)
-        if eff_tuple not in self.enqueued:
-            self.enqueued.add(eff_tuple)
-            self.queue.append(pddl.Atom(predicate, list(args)))
+        if atom not in self.enqueued:
+            self.enqueued.add(atom)
+            self.queue.append(atom)
     def pop(self):
         result = self.queue[self.queue_pos]
         self.queue_pos += 1
         return result
 
+def is_auxiliary_predicate(predicate):
+    return isinstance(predicate, str) and "$" in predicate
+
+def get_static_atoms(rules, atoms):
+    # Split the atoms into those of predicates that no rule derives (e.g.
+    # the precomputed static relations, see
+    # PrologProgram.evaluate_static_conditions) and the others.
+    derived_predicates = {rule.effect_template[0] for rule in rules}
+    static_atoms = []
+    other_atoms = []
+    for atom in atoms:
+        if atom[0] in derived_predicates:
+            other_atoms.append(atom)
+        else:
+            static_atoms.append(atom)
+    return static_atoms, other_atoms
+
+def compute_model_by_worklist(rules, fact_atoms, static_atoms=()):
+    # Process the reached atoms one at a time. The static atoms never
+    # enter the queue: we add them to the indexes of the rules and fire
+    # the rules for them before processing the queue, so that the rules
+    # look them up when firing for the queued atoms. The returned model
+    # does not contain them.
+    unifier = Unifier(rules)
+    # unifier.dump()
+    queue = Queue(fact_atoms)
+    for atom in static_atoms:
+        for rule, cond_index in unifier.unify(atom):
+            rule.update_index(atom, cond_index)
+            rule.fire(atom, cond_index, queue.push)
+    while queue:
+        next_atom = queue.pop()
+        matches = unifier.unify(next_atom)
+        for rule, cond_index in matches:
+            rule.update_index(next_atom, cond_index)
+            rule.fire(next_atom, cond_index, queue.push)
+    return queue.queue, queue.num_pushes
+
+def compute_model_by_batches(rules, fact_atoms, static_atoms=()):
+    # Semi-naive evaluation: In each round, we process the atoms reached
+    # in the previous round (the delta) in batches, one batch for each
+    # predicate, and fire each rule only for combinations of atoms that
+    # include at least one atom of the delta. As in
+    # compute_model_by_worklist, the static atoms are processed before
+    # all other atoms and are not part of the returned model.
+    #
+    # Conditions without constant arguments match all atoms of the
+    # batch. For the other conditions, we group the atoms of the batch
+    # by their arguments at the positions of the constants. Conditions
+    # with equality constraints are checked for each atom of the batch.
+    unconstrained_conditions = {}
+    constrained_conditions = {}
+    equality_conditions = {}
+    for rule in rules:
+        for cond_index, predicate in enumerate(rule.condition_predicates):
+            constants = rule.condition_constants[cond_index]
+            if rule.condition_equalities[cond_index]:
+                equality_conditions.setdefault(predicate, []).append(
+                    (rule, cond_index))
+                continue
+            if not constants:
+                unconstrained_conditions.setdefault(predicate, []).append(
+                    (rule, cond_index))
+                continue
+            positions = tuple(pos for pos, _ in constants)
+            values = tuple(obj for _, obj in constants)
+            by_positions = constrained_conditions.setdefault(predicate, {})
+            if positions not in by_positions:
+                by_positions[positions] = (get_key_function(positions), {})
+            _, conditions_by_values = by_positions[positions]
+            # Keys for single positions are single objects, not tuples.
+            if len(values) == 1:
+                values = values[0]
+            conditions_by_values.setdefault(values, []).append(
+                (rule, cond_index))
+
+    def process(delta, derived_atoms):
+        delta.sort(key=itemgetter(0))
+        for predicate, batch in itertools.groupby(delta, key=itemgetter(0)):
+            batch = list(batch)
+            for rule, cond_index in unconstrained_conditions.get(predicate, ()):
+                rule.fire_batch(batch, cond_index, derived_atoms)
+            by_positions = constrained_conditions.get(predicate, {})
+            for key_function, conditions_by_values in by_positions.values():
+                batch_by_values = {}
+                for atom in batch:
+                    values = key_function(atom)
+                    if values in conditions_by_values:
+                        batch_by_values.setdefault(values, []).append(atom)
+                for values, new_atoms in batch_by_values.items():
+                    for rule, cond_index in conditions_by_values[values]:
+                        rule.fire_batch(new_atoms, cond_index, derived_atoms)
+            for rule, cond_index in equality_conditions.get(predicate, ()):
+                new_atoms = [atom for atom in batch
+                             if rule.matches(atom, cond_index)]
+                if new_atoms:
+                    rule.fire_batch(new_atoms, cond_index, derived_atoms)
+
+    # The static atoms form a round of their own, and the atoms derived
+    # from them are processed along with the other facts.
+    derived_atoms = []
+    process(list(static_atoms), derived_atoms)
+    num_pushes = len(fact_atoms) + len(derived_atoms)
+    reached = set(fact_atoms)
+    delta = fact_atoms + [atom for atom in dict.fromkeys(derived_atoms)
+                          if atom not in reached]
+    reached.update(delta)
+    model = list(delta)
+    while delta:
+        derived_atoms = []
+        process(delta, derived_atoms)
+        num_pushes += len(derived_atoms)
+        delta = [atom for atom in dict.fromkeys(derived_atoms)
+                 if atom not in reached]
+        reached.update(delta)
+        model += delta
+    return model, num_pushes
+
+def get_strata(rules):
+    # Partition the rules into strata, one for each strongly connected
+    # component of the predicate dependency graph that contains the
+    # effect of a rule. Return the strata grouped by levels, where each
+    # stratum only depends on strata of lower levels, so that the strata
+    # of the same level are independent. A stratum is a pair of its rules
+    # and the predicates of the atoms it needs: those in the conditions
+    # of its rules and its own predicates, which can have facts.
+    dependencies = {}
+    for rule in rules:
+        effect_predicate = rule.effect_template[0]
+        dependencies.setdefault(effect_predicate, [])
+        for predicate in rule.condition_predicates:
+            dependencies.setdefault(predicate, []).append(effect_predicate)
+    level_by_predicate = {}
+    strata_by_level = []
+    rules_by_effect = {}
+    for rule in rules:
+        rules_by_effect.setdefault(rule.effect_template[0], []).append(rule)
+    for component in sccs.get_sccs_adjacency_dict(dependencies):
+        stratum_rules = [rule for predicate in component
+                         for rule in rules_by_effect.get(predicate, ())]
+        if not stratum_rules:
+            for predicate in component:
+                level_by_predicate[predicate] = 0
+            continue
+        input_predicates = set(component)
+        for rule in stratum_rules:
+            input_predicates.update(rule.condition_predicates)
+        level = 1 + max((level_by_predicate.get(predicate, 0)
+                         for predicate in input_predicates - set(component)),
+                        default=0)
+        for predicate in component:
+            level_by_predicate[predicate] = level
+        while len(strata_by_level) < level:
+            strata_by_level.append([])
+        strata_by_level[level - 1].append(
+            (stratum_rules, sorted(input_predicates)))
+    return strata_by_level
+
+# The strata of all levels. Worker processes inherit them when they are
+# forked, so that we only need to send the input atoms of the strata.
+_current_strata = None
+
+def _evaluate_stratum(task):
+    # Return the atoms derived for the stratum and the number of pushes.
+    # The atoms of the lower levels are static atoms for the stratum.
+    level, stratum_no, input_atoms = task
+    rules, _ = _current_strata[level][stratum_no]
+    static_atoms, fact_atoms = get_static_atoms(rules, input_atoms)
+    num_facts = len(fact_atoms)
+    atoms, num_pushes = compute_model_by_worklist(
+        rules, fact_atoms, static_atoms)
+    return atoms[num_facts:], num_pushes - num_facts
+
+def compute_model_by_strata(rules, fact_atoms, jobs, static_atoms=()):
+    # Evaluate the strata level by level with the worklist algorithm,
+    # starting from the atoms of the lower levels. With jobs > 1, the
+    # strata of a level are evaluated in parallel by forked worker
+    # processes. The workers are forked once for all levels. The result
+    # is the same as for compute_model_by_worklist except for the order
+    # of the atoms.
+    global _current_strata
+    _current_strata = get_strata(rules)
+    max_num_strata = max(
+        (len(strata) for strata in _current_strata), default=0)
+    pool = tools.get_worker_pool(min(jobs, max_num_strata))
+    try:
+        atoms_by_predicate = {}
+        for atom in itertools.chain(static_atoms, fact_atoms):
+            atoms_by_predicate.setdefault(atom[0], []).append(atom)
+        model = list(fact_atoms)
+        num_pushes = len(fact_atoms)
+        for level, strata in enumerate(_current_strata):
+            tasks = [
+                (level, stratum_no,
+                 [atom for predicate in input_predicates
+                  for atom in atoms_by_predicate.get(predicate, ())])
+                for stratum_no, (_, input_predicates) in enumerate(strata)]
+            if pool is not None and len(tasks) > 1:
+                results = pool.map(_evaluate_stratum, tasks)
+            else:
+                results = map(_evaluate_stratum, tasks)
+            for derived_atoms, stratum_pushes in results:
+                num_pushes += stratum_pushes
+                model += derived_atoms
+                for atom in derived_atoms:
+                    atoms_by_predicate.setdefault(atom[0], []).append(atom)
+    finally:
+        if pool is not None:
+            pool.terminate()
+        _current_strata = None
+    return model, num_pushes
+
 def compute_model(prog):
+    # The returned model contains the reached atoms except for those of
+    # the auxiliary predicates introduced when splitting the rules.
+    global numpy
+    batched = options.datalog_evaluation == "batched"
+    use_numpy = False
+    if batched:
+        # In the batched evaluation, we join with NumPy if it is installed.
+        try:
+            import numpy
+            use_numpy = True
+        except ImportError:
+            pass
     with timers.timing("Preparing model"):
-        rules = convert_rules(prog)
-        unifier = Unifier(rules)
-        # unifier.dump()
-        fact_atoms = sorted(fact.atom for fact in prog.facts)
-        queue = Queue(fact_atoms)
+        symbols = SymbolTable()
+        rules = convert_rules(prog, symbols, use_numpy=use_numpy)
+        fact_atoms = [symbols.encode_atom(atom) for atom in
+                      sorted(fact.atom for fact in prog.facts)]
+        static_atoms, queued_atoms = get_static_atoms(rules, fact_atoms)
+        auxiliary_predicates = {
+            symbol_id for symbol_id, symbol in enumerate(symbols.symbols)
+            if is_auxiliary_predicate(symbol)}
 
     print("Generated %d rules." % len(rules))
     with timers.timing("Computing model"):
-        relevant_atoms = 0
-        auxiliary_atoms = 0
-        while queue:
-            next_atom = queue.pop()
-            pred = next_atom.predicate
-            if isinstance(pred, str) and "$" in pred:
-                auxiliary_atoms += 1
-            else:
-                relevant_atoms += 1
-            matches = unifier.unify(next_atom)
-            for rule, cond_index in matches:
-                rule.update_index(next_atom, cond_index)
-                rule.fire(next_atom, cond_index, queue.push)
-    print("%d relevant atoms" % relevant_atoms)
+        num_queued_facts = len(queued_atoms)
+        if batched:
+            atoms, num_pushes = compute_model_by_batches(
+                rules, queued_atoms, static_atoms)
+        elif options.datalog_evaluation == "stratified":
+            atoms, num_pushes = compute_model_by_strata(
+                rules, queued_atoms, options.jobs, static_atoms)
+        else:
+            atoms, num_pushes = compute_model_by_worklist(
+                rules, queued_atoms, static_atoms)
+        # The static atoms did not enter the queue, but belong to the
+        # model. We keep the facts in their original order.
+        atoms = fact_atoms + atoms[num_queued_facts:]
+        auxiliary_atoms = sum(
+            1 for atom in atoms if atom[0] in auxiliary_predicates)
+    print("%d relevant atoms" % (len(atoms) - auxiliary_atoms))
     print("%d auxiliary atoms" % auxiliary_atoms)
-    print("%d final queue length" % len(queue.queue))
-    print("%d total queue pushes" % queue.num_pushes)
-    return queue.queue
+    print("%d final queue length" % (len(atoms) - len(static_atoms)))
+    print("%d total queue pushes" % num_pushes)
+    return [symbols.decode_atom(atom) for atom in atoms
+            if atom[0] not in auxiliary_predicates]
 
 if __name__ == "__main__":
     import pddl_parser
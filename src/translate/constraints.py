@@ -1,5 +1,4 @@
-import itertools
-from typing import Iterable, List, Tuple
+from typing import List, Tuple
 
 class InequalityDisjunction:
     def __init__(self, parts: List[Tuple[str, str]]):
@@ -80,6 +79,55 @@ class EqualityConjunction:
         return self._representative
 
 
+def _is_object(term):
+    return not isinstance(term, int) and not term.startswith("?")
+
+
+class _EquivalenceRelation:
+    """Union-find data structure for the finest equivalence relation induced
+       by a sequence of equalities. If an equivalence class contains an
+       object, the object is the root of the class. Equalities are added with
+       union and can be withdrawn in reverse order with undo, which allows
+       backtracking."""
+
+    def __init__(self):
+        self.parent = {} # only contains terms that are not a root
+        self.trail = []
+
+    def find(self, term):
+        parent = self.parent
+        while term in parent:
+            term = parent[term]
+        return term
+
+    def union(self, term1, term2):
+        """Add the equality term1 = term2. Return False without changing the
+           relation if this would put two objects into the same class."""
+        root1 = self.find(term1)
+        root2 = self.find(term2)
+        if root1 == root2:
+            return True
+        if _is_object(root2):
+            if _is_object(root1):
+                return False
+            root1, root2 = root2, root1
+        self.parent[root2] = root1
+        self.trail.append(root2)
+        return True
+
+    def undo(self, trail_length):
+        """Withdraw the equalities added after the trail had the given
+           length."""
+        while len(self.trail) > trail_length:
+            del self.parent[self.trail.pop()]
+
+    def is_constant(self, term):
+        return _is_object(self.find(term))
+
+    def are_equivalent(self, term1, term2):
+        return self.find(term1) == self.find(term2)
+
+
 class ConstraintSystem:
     """A ConstraintSystem stores two parts, both talking about the equality or
        inequality of strings and ints (strings representing objects or
@@ -124,12 +172,6 @@ class ConstraintSystem:
         ineq_part = " and ".join(ineq_disjunctions)
         return f"{eq_part} ({ineq_part}) (not constant {self.not_constant}"
 
-    def _combine_equality_conjunctions(self, eq_conjunctions:
-                                       Iterable[EqualityConjunction]) -> None:
-        all_eq = itertools.chain.from_iterable(c.equalities
-                                               for c in eq_conjunctions)
-        return EqualityConjunction(list(all_eq))
-
     def add_equality_conjunction(self, eq_conjunction: EqualityConjunction):
         self.add_equality_DNF([eq_conjunction])
 
@@ -149,29 +191,39 @@ class ConstraintSystem:
 
     def is_solvable(self):
         # cf. top of class for explanation
-        def inequality_disjunction_ok(ineq_disj, representative):
-            for inequality in ineq_disj.parts:
-                a, b = inequality
-                if representative.get(a, a) != representative.get(b, b):
-                    return True
+        # We pick the equality conjunctions one DNF at a time and extend the
+        # equivalence relation incrementally, backtracking to the next
+        # conjunction of the previous DNF if there is no solution. Picking
+        # more conjunctions can only merge equivalence classes. Therefore,
+        # we can discard a partial solution as soon as it is inconsistent,
+        # an element of not_constant is in the class of a constant or all
+        # inequalities of a disjunction are violated.
+        return self._extend_solution(_EquivalenceRelation(), 0)
+
+    def _is_violated(self, relation):
+        return (any(relation.is_constant(s) for s in self.not_constant) or
+                any(all(relation.are_equivalent(a, b) for a, b in d.parts)
+                    for d in self.ineq_disjunctions))
+
+    def _extend_solution(self, relation, dnf_no):
+        # The caller withdraws the equalities added here if we fail. There
+        # is no choice for DNFs with a single conjunction, so we only check
+        # the other constraints before a choice and for the final solution.
+        equality_DNFs = self.equality_DNFs
+        while dnf_no < len(equality_DNFs) and len(equality_DNFs[dnf_no]) == 1:
+            if not all(relation.union(v1, v2)
+                       for v1, v2 in equality_DNFs[dnf_no][0].equalities):
+                return False
+            dnf_no += 1
+        if self._is_violated(relation):
             return False
-
-        for eq_conjunction in itertools.product(*self.equality_DNFs):
-            combined = self._combine_equality_conjunctions(eq_conjunction)
-            if not combined.is_consistent():
-                continue
-            # check whether with the finest equivalence relation induced by the
-            # combined equality conjunction there is no element of not_constant
-            # in the same equivalence class as a constant and that in each
-            # inequality disjunction there is an inequality where the two terms
-            # are in different equivalence classes.
-            representative = combined.get_representative()
-            if any(not isinstance(representative.get(s, s), int) and
-                   representative.get(s, s)[0] != "?"
-                   for s in self.not_constant):
-                continue
-            if any(not inequality_disjunction_ok(d, representative)
-                   for d in self.ineq_disjunctions):
-                continue
+        if dnf_no == len(equality_DNFs):
             return True
+        trail_length = len(relation.trail)
+        for eq_conjunction in equality_DNFs[dnf_no]:
+            if (all(relation.union(v1, v2)
+                    for v1, v2 in eq_conjunction.equalities) and
+                    self._extend_solution(relation, dnf_no + 1)):
+                return True
+            relation.undo(trail_length)
         return False
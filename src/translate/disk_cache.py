@@ -0,0 +1,77 @@
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+from pathlib import Path
+
+# Helpers for the on-disk caches of the translator (see
+# pddl_parser.domain_cache and invariant_cache). Cache files are keyed
+# by a hash of the cached computation's input and of the translator
+# itself, so any change of the translator sources or of the Python
+# version invalidates all entries. Cache files are written to a
+# temporary file first and then atomically renamed, so concurrent
+# translator runs can share a cache directory: readers either see a
+# complete cache file or none at all.
+
+# Increase this number if the format of the cached data changes without
+# a change of the translator sources (e.g. because of a new pickle protocol).
+CACHE_FORMAT_VERSION = 1
+
+TRANSLATOR_DIR = Path(__file__).resolve().parent
+
+_translator_fingerprint = None
+
+
+def get_translator_fingerprint():
+    global _translator_fingerprint
+    if _translator_fingerprint is None:
+        fingerprint = hashlib.sha256()
+        fingerprint.update(f"{CACHE_FORMAT_VERSION} {sys.version}".encode())
+        for path in sorted(TRANSLATOR_DIR.rglob("*.py")):
+            fingerprint.update(str(path.relative_to(TRANSLATOR_DIR)).encode())
+            fingerprint.update(path.read_bytes())
+        _translator_fingerprint = fingerprint.digest()
+    return _translator_fingerprint
+
+
+def get_cache_file(cache_dir, prefix, key_data):
+    key = hashlib.sha256(get_translator_fingerprint())
+    key.update(key_data)
+    return Path(cache_dir) / f"{prefix}-{key.hexdigest()}.pickle"
+
+
+def load(cache_file, description):
+    try:
+        with open(cache_file, "rb") as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError,
+            ImportError, IndexError, TypeError, ValueError) as e:
+        # Treat unreadable or corrupted cache files as cache misses. They
+        # are overwritten when storing the newly computed data.
+        print(f"Warning: ignoring invalid {description} cache file "
+              f"{cache_file}: {e}")
+        return None
+
+
+def store(cache_file, data, description):
+    cache_dir = cache_file.parent
+    tmp_name = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+                dir=cache_dir, prefix=f"{cache_file.name}.", suffix=".tmp",
+                delete=False) as tmp_file:
+            tmp_name = tmp_file.name
+            pickle.dump(data, tmp_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, cache_file)
+    except OSError as e:
+        print(f"Warning: could not write {description} cache file "
+              f"{cache_file}: {e}")
+        if tmp_name is not None:
+            try:
+                os.remove(tmp_name)
+            except OSError:
+                pass
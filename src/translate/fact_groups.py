@@ -8,29 +8,41 @@ from typing import Dict, List, Set, Tuple
 DEBUG = False
 
 
-def expand_group(group, task, reachable_facts):
+def build_expansion_index(groups, reachable_facts):
+    # Map every predicate, position of a counted variable "?X" in a group
+    # and tuple of the other arguments to the matching reachable facts.
+    counted_positions = {}
+    for group in groups:
+        for fact in group:
+            if "?X" in fact.args:
+                counted_positions.setdefault(fact.predicate, set()).add(
+                    fact.args.index("?X"))
+    index = {}
+    for atom in reachable_facts:
+        for pos in counted_positions.get(atom.predicate, ()):
+            key = (atom.predicate, pos, atom.args[:pos] + atom.args[pos + 1:])
+            index.setdefault(key, []).append(atom)
+    return index
+
+def expand_group(group, reachable_facts, expansion_index):
     result = []
     for fact in group:
         try:
-            pos = list(fact.args).index("?X")
+            pos = fact.args.index("?X")
         except ValueError:
             if fact in reachable_facts:
                 result.append(fact)
         else:
-            # NOTE: This could be optimized by only trying objects of the correct
-            #       type, or by using a unifier which directly generates the
-            #       applicable objects. It is not worth optimizing this at this stage,
-            #       though.
-            for obj in task.objects:
-                newargs = list(fact.args)
-                newargs[pos] = obj.name
-                atom = pddl.Atom(fact.predicate, newargs)
-                if atom in reachable_facts:
-                    result.append(atom)
+            # Reachable facts only have objects as arguments, so the index
+            # contains exactly the reachable instantiations of "?X".
+            key = (fact.predicate, pos, fact.args[:pos] + fact.args[pos + 1:])
+            result += expansion_index.get(key, ())
     return result
 
-def instantiate_groups(groups, task, reachable_facts):
-    return [expand_group(group, task, reachable_facts) for group in groups]
+def instantiate_groups(groups, reachable_facts):
+    expansion_index = build_expansion_index(groups, reachable_facts)
+    return [expand_group(group, reachable_facts, expansion_index)
+            for group in groups]
 
 class GroupCoverQueue:
     def __init__(self, groups):
@@ -123,7 +135,7 @@ def compute_groups(task: pddl.Task, atoms: Set[pddl.Literal],
     groups = invariant_finder.get_groups(task, reachable_action_params)
 
     with timers.timing("Instantiating groups"):
-        groups = instantiate_groups(groups, task, atoms)
+        groups = instantiate_groups(groups, atoms)
 
     # Sort here already to get deterministic mutex groups.
     groups = sort_groups(groups)
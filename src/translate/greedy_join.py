@@ -1,5 +1,3 @@
-import sys
-
 import pddl
 import pddl_to_prolog
 
@@ -40,10 +38,10 @@ class CostMatrix:
         del self.joinees[index]
     def find_min_pair(self):
         assert len(self.joinees) >= 2
-        min_cost = (sys.maxsize, sys.maxsize)
+        min_cost = None
         for i, row in enumerate(self.cost_matrix):
             for j, entry in enumerate(row):
-                if entry < min_cost:
+                if min_cost is None or entry < min_cost:
                     min_cost = entry
                     left_index, right_index = i, j
         return left_index, right_index
@@ -66,6 +64,146 @@ class CostMatrix:
     def can_join(self):
         return len(self.joinees) >= 2
 
+class StatisticsCostMatrix(CostMatrix):
+    """Prefers the joins whose result is estimated to have the fewest
+    atoms, based on cardinality statistics of the initial state. Ties
+    are broken by the syntactic cost of CostMatrix."""
+    def __init__(self, joinees, statistics):
+        self.statistics = statistics
+        CostMatrix.__init__(self, joinees)
+    def compute_join_cost(self, left_joinee, right_joinee):
+        syntactic_cost = CostMatrix.compute_join_cost(
+            self, left_joinee, right_joinee)
+        # Never prefer a product (a join without common variables) over
+        # a proper join, even if it is estimated to be smaller.
+        is_product = syntactic_cost[2] == 0
+        join_size = self.statistics.estimate_join(
+            left_joinee, right_joinee).size
+        return (is_product, join_size, syntactic_cost)
+
+class Estimate:
+    """Estimated number of atoms of a symbolic atom and estimated number
+    of distinct values of each of its variables."""
+    def __init__(self, size, distinct_values):
+        self.size = size
+        self.distinct_values = distinct_values
+    def project(self, variables):
+        projected_size = 1
+        for var in variables:
+            projected_size *= self.distinct_values[var]
+        return Estimate(min(self.size, projected_size),
+                        {var: self.distinct_values[var] for var in variables})
+    def join(self, other):
+        size = self.size * other.size
+        distinct_values = dict(self.distinct_values)
+        for var, values in other.distinct_values.items():
+            if var in distinct_values:
+                size /= max(distinct_values[var], values, 1)
+                distinct_values[var] = min(distinct_values[var], values)
+            else:
+                distinct_values[var] = values
+        return Estimate(size, distinct_values)
+
+class CardinalityStatistics:
+    """Estimates the number of atoms of the conditions of a Datalog
+    program and of the joins of these conditions.
+
+    Static predicates (those that are not the effect of any rule) are
+    described exactly by the facts, i.e., by the initial state, the types
+    of the objects and the equality predicate. For all other predicates,
+    the number of distinct values at each argument position is bounded
+    by a fixpoint computation over the rules, and the number of atoms is
+    estimated as the product of these bounds."""
+    def __init__(self, facts, rules):
+        args_by_predicate = {}
+        for fact in facts:
+            atom = fact.atom
+            args_by_predicate.setdefault(atom.predicate, set()).add(atom.args)
+        objects = set()
+        for args_set in args_by_predicate.values():
+            for args in args_set:
+                objects.update(args)
+        self.num_objects = max(len(objects), 1)
+
+        self.sizes = {}
+        self.distinct_values = {}
+        for predicate, args_set in args_by_predicate.items():
+            self.sizes[predicate] = len(args_set)
+            self.distinct_values[predicate] = [
+                len(set(values)) for values in zip(*args_set)]
+        self._bound_derived_predicates(rules)
+        self.estimates = {}
+
+    def _get_distinct_values(self, atom):
+        distinct_values = self.distinct_values.get(atom.predicate)
+        if distinct_values is None:
+            distinct_values = [0] * len(atom.args)
+            self.distinct_values[atom.predicate] = distinct_values
+        return distinct_values
+
+    def _bound_derived_predicates(self, rules):
+        derived_predicates = {rule.effect.predicate for rule in rules}
+        changed = True
+        while changed:
+            changed = False
+            for rule in rules:
+                var_bounds = {}
+                for cond in rule.conditions:
+                    cond_values = self._get_distinct_values(cond)
+                    for var, values in zip(cond.args, cond_values):
+                        if var[0] == "?":
+                            var_bounds[var] = min(
+                                var_bounds.get(var, values), values)
+                eff_values = self._get_distinct_values(rule.effect)
+                for pos, arg in enumerate(rule.effect.args):
+                    if arg[0] == "?":
+                        # Free effect variables can take any object.
+                        values = var_bounds.get(arg, self.num_objects)
+                    else:
+                        values = 1
+                    if values > eff_values[pos]:
+                        eff_values[pos] = values
+                        changed = True
+        for predicate in derived_predicates:
+            size = 1
+            for values in self.distinct_values[predicate]:
+                size *= values
+            self.sizes[predicate] = max(self.sizes.get(predicate, 0), size)
+
+    def get_estimate(self, atom):
+        estimate = self.estimates.get(atom)
+        if estimate is None:
+            size = self.sizes.get(atom.predicate, 0)
+            distinct_values = {}
+            for arg, values in zip(atom.args, self._get_distinct_values(atom)):
+                if arg[0] == "?":
+                    distinct_values[arg] = values
+                elif values:
+                    # Selecting a constant keeps one value out of many.
+                    size /= values
+            estimate = Estimate(size, distinct_values)
+            self.estimates[atom] = estimate
+        return estimate
+
+    def estimate_join(self, left_joinee, right_joinee):
+        return self.get_estimate(left_joinee).join(
+            self.get_estimate(right_joinee))
+
+    def estimate_rule(self, rule):
+        # Estimate the number of effect atoms the rule derives.
+        estimate = self.get_estimate(rule.conditions[0])
+        for condition in rule.conditions[1:]:
+            estimate = estimate.join(self.get_estimate(condition))
+        return estimate.project(pddl_to_prolog.get_variables([rule.effect]))
+
+    def add_projection(self, atom, joinee):
+        self.estimates[atom] = self.get_estimate(joinee).project(
+            pddl_to_prolog.get_variables([atom]))
+
+    def add_join(self, atom, left_joinee, right_joinee):
+        self.estimates[atom] = self.estimate_join(
+            left_joinee, right_joinee).project(pddl_to_prolog.get_variables([atom]))
+
 class ResultList:
     def __init__(self, rule, name_generator):
         self.final_effect = rule.effect
@@ -81,9 +219,12 @@ class ResultList:
         self.result.append(rule)
         return rule.effect
 
-def greedy_join(rule, name_generator):
+def greedy_join(rule, name_generator, statistics=None):
     assert len(rule.conditions) >= 2
-    cost_matrix = CostMatrix(rule.conditions)
+    if statistics is None:
+        cost_matrix = CostMatrix(rule.conditions)
+    else:
+        cost_matrix = StatisticsCostMatrix(rule.conditions, statistics)
     occurrences = OccurrencesTracker(rule)
     result = ResultList(rule, name_generator)
 
@@ -100,7 +241,11 @@ def greedy_join(rule, name_generator):
             retained_vars = joinee_vars & (effect_vars | common_vars)
             if retained_vars != joinee_vars:
                 joinees[i] = result.add_rule("project", [joinee], sorted(retained_vars))
+                if statistics is not None:
+                    statistics.add_projection(joinees[i], joinee)
         joint_condition = result.add_rule("join", joinees, sorted(effect_vars))
+        if statistics is not None:
+            statistics.add_join(joint_condition, *joinees)
         cost_matrix.add_entry(joint_condition)
         occurrences.update(joint_condition, +1)
 
@@ -2,20 +2,24 @@
 
 
 from collections import defaultdict
+from operator import itemgetter
 from typing import Any, Dict, List, Optional, Set, Tuple
 
 import build_model
+import greedy_join
+import options
 import pddl_to_prolog
 import pddl
+import sccs
 import timers
+import tools
+
+
+class GroundingSizeLimitExceeded(Exception):
+    pass
 
 def get_fluent_facts(task, model):
-    fluent_predicates = set()
-    for action in task.actions:
-        for effect in action.effects:
-            fluent_predicates.add(effect.literal.predicate)
-    for axiom in task.axioms:
-        fluent_predicates.add(axiom.name)
+    fluent_predicates = pddl_to_prolog.get_fluent_predicates(task)
     return {fact for fact in model
             if fact.predicate in fluent_predicates}
 
@@ -51,6 +55,346 @@ def instantiate_goal(goal, init_facts, fluent_facts):
         return None
     return result
 
+def get_literals(condition):
+    # Return the literals of a normalized condition, or None if the
+    # condition has an unexpected form.
+    if isinstance(condition, pddl.ExistentialCondition):
+        condition = condition.parts[0]
+    if isinstance(condition, pddl.Truth):
+        return []
+    elif isinstance(condition, pddl.Literal):
+        return [condition]
+    elif isinstance(condition, pddl.Conjunction) and all(
+            isinstance(part, pddl.Literal) for part in condition.parts):
+        return list(condition.parts)
+    return None
+
+def make_args_getter(indices):
+    if not indices:
+        return lambda values: ()
+    elif len(indices) == 1:
+        index = indices[0]
+        return lambda values: (values[index],)
+    else:
+        return itemgetter(*indices)
+
+class SchemaCompiler:
+    """Compiles the normalized action and axiom schemas into functions
+    that instantiate the schema for a tuple of arguments, i.e., for the
+    arguments of an atom of the schema in the model. They compute the
+    same result as Action.instantiate and Axiom.instantiate, but avoid
+    walking the conditions and effects of the schema with a variable
+    mapping for each instantiation.
+
+    The compiled functions look up the arguments of the instantiated
+    literals by position in a tuple of values: the arguments of the
+    schema, followed by the constants used in the schema and, for
+    universal effects, by the objects for the effect parameters. The
+    literals of static predicates are checked against the arguments of
+    the initial state facts of the predicate, so we don't need to build
+    atoms for them."""
+    def __init__(self, task, init_facts, init_assignments, fluent_facts,
+                 type_to_objects):
+        self.init_facts = init_facts
+        self.init_assignments = init_assignments
+        self.fluent_facts = fluent_facts
+        self.type_to_objects = type_to_objects
+        self.use_min_cost_metric = task.use_min_cost_metric
+        self.fluent_predicates = pddl_to_prolog.get_fluent_predicates(task)
+        self.static_args_by_predicate = defaultdict(set)
+        for atom in init_facts:
+            if atom.predicate not in self.fluent_predicates:
+                self.static_args_by_predicate[atom.predicate].add(atom.args)
+
+    def _get_layout(self, parameters, literals, local_variables=()):
+        # Map the parameters and the constants of the literals to their
+        # positions in the values. The local variables (the parameters of
+        # universal effects) are placed after the constants later on.
+        layout = {par.name: index for index, par in enumerate(parameters)}
+        constants = []
+        for literal in literals:
+            for arg in literal.args:
+                if arg not in layout and arg not in local_variables:
+                    # Unmapped variables are kept as they are, just like
+                    # constants.
+                    layout[arg] = len(layout)
+                    constants.append(arg)
+        return layout, tuple(constants)
+
+    def _compile_literals(self, literals, layout):
+        # Return a function that appends the fluent literals for the given
+        # values to a result list. It returns False if a static literal
+        # (or one of a fluent predicate that is not reachable) is false.
+        compiled = []
+        for literal in literals:
+            get_args = make_args_getter([layout[arg] for arg in literal.args])
+            if literal.predicate == "=":
+                compiled.append((literal.negated, get_args, None, None))
+            elif literal.predicate in self.fluent_predicates:
+                compiled.append((literal.negated, get_args, literal.predicate,
+                                 None))
+            else:
+                compiled.append((literal.negated, get_args, None,
+                                 self.static_args_by_predicate[
+                                     literal.predicate]))
+        init_facts = self.init_facts
+        fluent_facts = self.fluent_facts
+        intern_literal = pddl.conditions.intern_literal
+        def instantiate_literals(values, result):
+            for negated, get_args, predicate, static_args in compiled:
+                args = get_args(values)
+                if predicate is not None:
+                    atom = pddl.Atom(predicate, args)
+                    if atom in fluent_facts:
+                        if negated:
+                            atom = pddl.NegatedAtom(predicate, args)
+                        result.append(intern_literal(atom))
+                    elif (atom in init_facts) == negated:
+                        return False
+                elif static_args is not None:
+                    if (args in static_args) == negated:
+                        return False
+                elif (args[0] == args[1]) == negated:
+                    return False
+            return True
+        return instantiate_literals
+
+    def _compile_effect_parameters(self, parameters, condition_literals,
+                                   layout):
+        # Return a function that maps the values of an action to the
+        # tuples of objects for the parameters of a universal effect, in
+        # the order of pddl.effects.cartesian_product. If the effect
+        # condition contains static literals with effect parameters, we
+        # only generate the combinations that satisfy them by joining
+        # indexes over the static facts. For each of these literals, the
+        # index maps the arguments that do not depend on the effect
+        # parameters to the assignments of the effect parameters.
+        object_lists = [self.type_to_objects.get(par.type_name, [])
+                        for par in parameters]
+        parameter_numbers = {par.name: no for no, par in enumerate(parameters)}
+        static_joins = []
+        for literal in condition_literals:
+            if (literal.negated or literal.predicate == "=" or
+                    literal.predicate in self.fluent_predicates or
+                    not any(arg in parameter_numbers for arg in literal.args)):
+                continue
+            bound_positions = [pos for pos, arg in enumerate(literal.args)
+                               if arg not in parameter_numbers]
+            index = defaultdict(list)
+            for args in self.static_args_by_predicate[literal.predicate]:
+                assignment = {}
+                for arg, obj in zip(literal.args, args):
+                    no = parameter_numbers.get(arg)
+                    if no is not None and assignment.setdefault(no, obj) != obj:
+                        break
+                else:
+                    key = tuple(args[pos] for pos in bound_positions)
+                    index[key].append(assignment)
+            get_key = make_args_getter(
+                [layout[literal.args[pos]] for pos in bound_positions])
+            static_joins.append((get_key, index))
+        if not static_joins:
+            return lambda values: pddl.effects.cartesian_product(*object_lists)
+
+        object_positions = [{obj: pos for pos, obj in enumerate(objects)}
+                            for objects in object_lists]
+        def get_object_tuples(values):
+            assignments = [{}]
+            for get_key, index in static_joins:
+                entries = index.get(get_key(values), ())
+                new_assignments = []
+                for assignment in assignments:
+                    for entry in entries:
+                        if all(assignment.get(no, obj) == obj
+                               for no, obj in entry.items()):
+                            new_assignment = dict(assignment)
+                            new_assignment.update(entry)
+                            new_assignments.append(new_assignment)
+                assignments = new_assignments
+            object_tuples = []
+            for assignment in assignments:
+                # Objects of the wrong type cannot be used, and the
+                # parameters without static literals can take any object.
+                candidate_lists = []
+                for no, objects in enumerate(object_lists):
+                    if no in assignment:
+                        obj = assignment[no]
+                        if obj not in object_positions[no]:
+                            break
+                        candidate_lists.append([obj])
+                    else:
+                        candidate_lists.append(objects)
+                else:
+                    object_tuples += pddl.effects.cartesian_product(
+                        *candidate_lists)
+            object_tuples.sort(key=lambda object_tuple: [
+                positions[obj] for positions, obj in
+                zip(reversed(object_positions), reversed(object_tuple))])
+            return object_tuples
+        return get_object_tuples
+
+    def _compile_effect(self, effect, layout):
+        condition_literals = get_literals(effect.condition)
+        if condition_literals is None:
+            return None
+        layout = dict(layout)
+        if effect.parameters:
+            get_object_tuples = self._compile_effect_parameters(
+                effect.parameters, condition_literals, layout)
+        for par in effect.parameters:
+            layout[par.name] = len(layout)
+        instantiate_condition = self._compile_literals(
+            condition_literals, layout)
+        instantiate_literal = self._compile_literals([effect.literal], layout)
+        def instantiate_effect(values, result):
+            if effect.parameters:
+                value_tuples = [values + object_tuple for object_tuple in
+                                get_object_tuples(values)]
+            else:
+                value_tuples = [values]
+            for effect_values in value_tuples:
+                condition = []
+                if not instantiate_condition(effect_values, condition):
+                    continue
+                literals = []
+                if not instantiate_literal(effect_values, literals):
+                    raise pddl.conditions.Impossible()
+                if literals:
+                    result.append((condition, literals[0]))
+        return instantiate_effect
+
+    def _compile_cost(self, cost, layout):
+        if not self.use_min_cost_metric:
+            return lambda values: 1
+        elif cost is None:
+            return lambda values: 0
+        expression = cost.expression
+        if isinstance(expression, pddl.NumericConstant):
+            return lambda values: expression.value
+        assert isinstance(expression, pddl.PrimitiveNumericExpression)
+        assert expression.symbol != "total-cost"
+        get_args = make_args_getter([layout[arg] for arg in expression.args])
+        init_assignments = self.init_assignments
+        def instantiate_cost(values):
+            pne = pddl.PrimitiveNumericExpression(
+                expression.symbol, get_args(values))
+            result = init_assignments.get(pne)
+            assert result is not None, (
+                "Could not find instantiation for PNE: %r" % (str(pne),))
+            return int(result.value)
+        return instantiate_cost
+
+    def _get_generic_action_instantiator(self, action):
+        def instantiate_action(args):
+            variable_mapping = {par.name: arg
+                                for par, arg in zip(action.parameters, args)}
+            return action.instantiate(
+                variable_mapping, self.init_facts, self.init_assignments,
+                self.fluent_facts, self.type_to_objects,
+                self.use_min_cost_metric)
+        return instantiate_action
+
+    def _get_generic_axiom_instantiator(self, axiom):
+        def instantiate_axiom(args):
+            variable_mapping = {par.name: arg
+                                for par, arg in zip(axiom.parameters, args)}
+            return axiom.instantiate(
+                variable_mapping, self.init_facts, self.fluent_facts)
+        return instantiate_axiom
+
+    def compile_action(self, action):
+        # Return a function that maps the arguments of an action atom in
+        # the model to the PropositionalAction or None. Actions with
+        # unexpected condition forms are instantiated with
+        # Action.instantiate.
+        precondition_literals = get_literals(action.precondition)
+        if precondition_literals is None:
+            return self._get_generic_action_instantiator(action)
+        literals = list(precondition_literals)
+        for effect in action.effects:
+            effect_literals = get_literals(effect.condition)
+            if effect_literals is None:
+                return self._get_generic_action_instantiator(action)
+            literals += effect_literals
+            literals.append(effect.literal)
+        cost_args = []
+        if action.cost is not None and isinstance(
+                action.cost.expression, pddl.PrimitiveNumericExpression):
+            cost_args.append(action.cost.expression)
+        effect_parameters = {par.name for effect in action.effects
+                             for par in effect.parameters}
+        layout, constants = self._get_layout(
+            action.parameters, literals + cost_args, effect_parameters)
+        instantiate_precondition = self._compile_literals(
+            precondition_literals, layout)
+        effect_instantiators = [self._compile_effect(effect, layout)
+                                for effect in action.effects]
+        instantiate_cost = self._compile_cost(action.cost, layout)
+        num_parameters = len(action.parameters)
+        name_prefix = "(%s " % action.name
+        num_external_parameters = action.num_external_parameters
+        def instantiate_action(args):
+            values = args[:num_parameters] + constants
+            precondition = []
+            if not instantiate_precondition(values, precondition):
+                return None
+            effects = []
+            for instantiate_effect in effect_instantiators:
+                instantiate_effect(values, effects)
+            if not effects:
+                return None
+            name = name_prefix + " ".join(args[:num_external_parameters]) + ")"
+            return pddl.PropositionalAction(
+                name, precondition, effects, instantiate_cost(values))
+        return instantiate_action
+
+    def compile_axiom(self, axiom):
+        condition_literals = get_literals(axiom.condition)
+        if condition_literals is None:
+            return self._get_generic_axiom_instantiator(axiom)
+        layout, constants = self._get_layout(
+            axiom.parameters, condition_literals)
+        instantiate_condition = self._compile_literals(
+            condition_literals, layout)
+        num_parameters = len(axiom.parameters)
+        num_external_parameters = axiom.num_external_parameters
+        axiom_name = axiom.name
+        def instantiate_axiom(args):
+            values = args[:num_parameters] + constants
+            condition = []
+            if not instantiate_condition(values, condition):
+                return None
+            effect_args = args[:num_external_parameters]
+            name = "(%s)" % " ".join((axiom_name,) + effect_args)
+            return pddl.PropositionalAxiom(
+                name, condition, pddl.Atom(axiom_name, effect_args))
+        return instantiate_axiom
+
+# The atoms and instantiation functions of the current call of
+# instantiate_atoms. Worker processes inherit them when they are forked.
+_current_instantiation = None
+
+def _instantiate_chunk(chunk):
+    atoms, instantiators = _current_instantiation
+    start, end = chunk
+    return [instantiators[atom.predicate](atom.args)
+            for atom in atoms[start:end]]
+
+def instantiate_atoms(atoms, instantiators, jobs):
+    # Return the instantiations of the action and axiom atoms in the
+    # order of the atoms. With jobs > 1, the atoms are split into
+    # consecutive chunks that are instantiated by worker processes.
+    global _current_instantiation
+    _current_instantiation = (atoms, instantiators)
+    num_chunks = max(1, min(jobs * 4, len(atoms)))
+    bounds = [len(atoms) * i // num_chunks for i in range(num_chunks + 1)]
+    try:
+        results = tools.parallel_map(
+            _instantiate_chunk, list(zip(bounds, bounds[1:])), jobs)
+    finally:
+        _current_instantiation = None
+    return [result for chunk_results in results for result in chunk_results]
+
 # The input task must have been normalized
 # The model has been computed by build_model.compute_model
 def instantiate(task: pddl.Task, model: Any) -> Tuple[
@@ -72,48 +416,122 @@ def instantiate(task: pddl.Task, model: Any) -> Tuple[
             init_facts.add(element)
 
     type_to_objects = get_objects_by_type(task.objects, task.types)
+    # Let the instantiated actions and axioms share the literal objects,
+    # using the atoms of the model as canonical atoms.
+    pddl.conditions.set_literal_table({fact: fact for fact in fluent_facts})
+    try:
+        compiler = SchemaCompiler(task, init_facts, init_assignments,
+                                  fluent_facts, type_to_objects)
+        instantiators = {}
 
-    instantiated_actions = []
-    instantiated_axioms = []
-    reachable_action_parameters = defaultdict(list)
-    for atom in model:
-        if isinstance(atom.predicate, pddl.Action):
-            action = atom.predicate
-            parameters = action.parameters
-            inst_parameters = atom.args[:len(parameters)]
-            # Note: It's important that we use the action object
-            # itself as the key in reachable_action_parameters (rather
-            # than action.name) since we can have multiple different
-            # actions with the same name after normalization, and we
-            # want to distinguish their instantiations.
-            reachable_action_parameters[action].append(inst_parameters)
-            variable_mapping = {par.name: arg
-                                for par, arg in zip(parameters, atom.args)}
-            inst_action = action.instantiate(
-                variable_mapping, init_facts, init_assignments,
-                fluent_facts, type_to_objects,
-                task.use_min_cost_metric)
-            if inst_action:
-                instantiated_actions.append(inst_action)
-        elif isinstance(atom.predicate, pddl.Axiom):
-            axiom = atom.predicate
-            variable_mapping = {par.name: arg
-                                for par, arg in zip(axiom.parameters, atom.args)}
-            inst_axiom = axiom.instantiate(variable_mapping, init_facts, fluent_facts)
-            if inst_axiom:
-                instantiated_axioms.append(inst_axiom)
-        elif atom.predicate == "@goal-reachable":
-            relaxed_reachable = True
+        schema_atoms = []
+        reachable_action_parameters = defaultdict(list)
+        for atom in model:
+            if isinstance(atom.predicate, pddl.Action):
+                action = atom.predicate
+                parameters = action.parameters
+                inst_parameters = atom.args[:len(parameters)]
+                # Note: It's important that we use the action object
+                # itself as the key in reachable_action_parameters (rather
+                # than action.name) since we can have multiple different
+                # actions with the same name after normalization, and we
+                # want to distinguish their instantiations.
+                reachable_action_parameters[action].append(inst_parameters)
+                if action not in instantiators:
+                    instantiators[action] = compiler.compile_action(action)
+                schema_atoms.append(atom)
+            elif isinstance(atom.predicate, pddl.Axiom):
+                axiom = atom.predicate
+                if axiom not in instantiators:
+                    instantiators[axiom] = compiler.compile_axiom(axiom)
+                schema_atoms.append(atom)
+            elif atom.predicate == "@goal-reachable":
+                relaxed_reachable = True
 
-    instantiated_goal = instantiate_goal(task.goal, init_facts, fluent_facts)
+        instantiated_actions = []
+        instantiated_axioms = []
+        for atom, result in zip(schema_atoms, instantiate_atoms(
+                schema_atoms, instantiators, options.jobs)):
+            if not result:
+                continue
+            if isinstance(atom.predicate, pddl.Action):
+                instantiated_actions.append(result)
+            else:
+                instantiated_axioms.append(result)
+
+        instantiated_goal = instantiate_goal(
+            task.goal, init_facts, fluent_facts)
+    finally:
+        pddl.conditions.set_literal_table(None)
 
     return (relaxed_reachable, fluent_facts,
             instantiated_actions, instantiated_goal,
             sorted(instantiated_axioms), reachable_action_parameters)
 
 
+def estimate_model_sizes(prog):
+    """Estimate the number of atoms of each predicate in the model of
+    the Datalog program without computing the model.
+
+    The predicates are processed in a topological order of the strongly
+    connected components of their dependency graph. The atoms of a
+    recursive predicate are bounded by the product of the numbers of
+    distinct values at its argument positions. For all other predicates,
+    we sum up the estimated numbers of atoms derived by their rules,
+    which only depend on predicates that have already been estimated."""
+    statistics = greedy_join.CardinalityStatistics(prog.facts, prog.rules)
+    num_facts = defaultdict(int)
+    dependencies = {}
+    for fact in prog.facts:
+        num_facts[fact.atom.predicate] += 1
+        dependencies.setdefault(fact.atom.predicate, [])
+    rules_by_effect = defaultdict(list)
+    for rule in prog.rules:
+        effect_predicate = rule.effect.predicate
+        rules_by_effect[effect_predicate].append(rule)
+        dependencies.setdefault(effect_predicate, [])
+        for condition in rule.conditions:
+            dependencies.setdefault(condition.predicate, []).append(
+                effect_predicate)
+    for component in sccs.get_sccs_adjacency_dict(dependencies):
+        predicate = component[0]
+        if (len(component) > 1 or predicate in dependencies[predicate] or
+                predicate not in rules_by_effect):
+            continue
+        size = num_facts[predicate]
+        for rule in rules_by_effect[predicate]:
+            size += statistics.estimate_rule(rule).size
+        statistics.sizes[predicate] = min(size, statistics.sizes[predicate])
+    return {predicate: statistics.sizes.get(predicate, 0)
+            for predicate in dependencies}
+
+
+def check_grounding_size(prog, limit):
+    with timers.timing("Estimating grounding size", block=True):
+        sizes = estimate_model_sizes(prog)
+        num_atoms = 0
+        num_actions = 0
+        num_axioms = 0
+        for predicate, size in sizes.items():
+            if isinstance(predicate, pddl.Action):
+                num_actions += size
+            elif isinstance(predicate, pddl.Axiom):
+                num_axioms += size
+            elif not build_model.is_auxiliary_predicate(predicate):
+                num_atoms += size
+        print("Estimated %d atoms, %d actions and %d axioms." % (
+            num_atoms, num_actions, num_axioms))
+    estimated_size = num_atoms + num_actions + num_axioms
+    if estimated_size > limit:
+        raise GroundingSizeLimitExceeded(
+            "Estimated grounding size %d exceeds the limit of %d." % (
+                estimated_size, limit))
+
+
 def explore(task):
     prog = pddl_to_prolog.translate(task)
+    if options.grounding_size_limit is not None:
+        check_grounding_size(prog, options.grounding_size_limit)
     model = build_model.compute_model(prog)
     with timers.timing("Completing instantiation"):
         return instantiate(task, model)
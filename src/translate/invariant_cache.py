@@ -0,0 +1,20 @@
+import disk_cache
+
+# Invariants are cached on disk, keyed by a hash of a description of
+# everything the invariant synthesis depends on (see
+# invariant_finder.get_cache_description) and of the translator itself
+# (see disk_cache). Since tasks of the same domain usually lead to the
+# same description, they share the cache entry.
+
+
+def get_cache_file(cache_dir, description):
+    return disk_cache.get_cache_file(
+        cache_dir, "invariants", description.encode())
+
+
+def load(cache_file):
+    return disk_cache.load(cache_file, "invariant")
+
+
+def store(cache_file, invariants):
+    disk_cache.store(cache_file, invariants, "invariant")
@@ -3,7 +3,6 @@
 
 from collections import deque, defaultdict
 import itertools
-import random
 import time
 from typing import List
 
@@ -11,12 +10,21 @@ import invariants
 import options
 import pddl
 import timers
+import tools
 
 class BalanceChecker:
     def __init__(self, task, reachable_action_params):
         self.predicates_to_add_actions = defaultdict(list)
-        self.random = random.Random(314159)
+        self.random_seed = 314159
         self.action_to_heavy_action = {}
+        self.action_to_add_predicates = {}
+        self.action_to_effect_predicates = {}
+        # Memoized results of the balance checks of single actions, see
+        # Invariant.check_balance.
+        self.too_heavy_verdicts = {}
+        self.unbalanced_add_effects = {}
+        self.num_memo_hits = 0
+        self.num_memo_misses = 0
         for act in task.actions:
             action = self.add_inequality_preconds(act, reachable_action_params)
             too_heavy_effects = []
@@ -40,6 +48,11 @@ class BalanceChecker:
             # heavy_act: duplicated universal effects and assigned unique names
             # to all quantified variables (implicitly in constructor)
             self.action_to_heavy_action[action] = heavy_act
+            self.action_to_add_predicates[action] = {
+                eff.literal.predicate for eff in action.effects
+                if not eff.literal.negated}
+            self.action_to_effect_predicates[action] = {
+                eff.literal.predicate for eff in action.effects}
 
     def get_threats(self, predicate):
         return self.predicates_to_add_actions.get(predicate, list())
@@ -47,6 +60,21 @@ class BalanceChecker:
     def get_heavy_action(self, action):
         return self.action_to_heavy_action[action]
 
+    def get_add_predicates(self, action):
+        return self.action_to_add_predicates[action]
+
+    def get_effect_predicates(self, action):
+        return self.action_to_effect_predicates[action]
+
+    def memoize(self, memo, key, compute):
+        if key in memo:
+            self.num_memo_hits += 1
+            return memo[key]
+        self.num_memo_misses += 1
+        result = compute()
+        memo[key] = result
+        return result
+
     def add_inequality_preconds(self, action, reachable_action_params):
         if reachable_action_params is None or len(action.parameters) < 2:
             return action
@@ -91,27 +119,125 @@ def get_initial_invariants(task):
             part = invariants.InvariantPart(predicate.name, inv_args, omitted)
             yield invariants.Invariant((part,))
 
+# The balance checker of the current call of search_invariants. Worker
+# processes inherit it when they are forked.
+_current_balance_checker = None
+
+def _check_candidate(candidate):
+    # Return whether the candidate is balanced, the list of refined
+    # candidates that the check enqueued, in order, and the numbers of
+    # memo hits and misses of the check.
+    balance_checker = _current_balance_checker
+    num_hits = balance_checker.num_memo_hits
+    num_misses = balance_checker.num_memo_misses
+    refined_candidates = []
+    balanced = candidate.check_balance(
+        balance_checker, refined_candidates.append)
+    return (balanced, refined_candidates,
+            balance_checker.num_memo_hits - num_hits,
+            balance_checker.num_memo_misses - num_misses)
+
 def find_invariants(task, reachable_action_params):
+    balance_checker = BalanceChecker(task, reachable_action_params)
+    invariants, _ = search_invariants(task, balance_checker)
+    return invariants
+
+def search_invariants(task, balance_checker):
+    # Return the list of invariants and whether the search was completed
+    # within the time limit.
+    global _current_balance_checker
+    _current_balance_checker = balance_checker
+    try:
+        result = _search_invariants(task, balance_checker)
+    finally:
+        _current_balance_checker = None
+    print("%d memoized and %d computed action balance checks" % (
+        balance_checker.num_memo_hits, balance_checker.num_memo_misses))
+    return result
+
+def _search_invariants(task, balance_checker):
     limit = options.invariant_generation_max_candidates
     candidates = deque(itertools.islice(get_initial_invariants(task), 0, limit))
     print(len(candidates), "initial candidates")
     seen_candidates = set(candidates)
-
-    balance_checker = BalanceChecker(task, reachable_action_params)
+    invariants = []
 
     def enqueue_func(invariant):
         if len(seen_candidates) < limit and invariant not in seen_candidates:
             candidates.append(invariant)
             seen_candidates.add(invariant)
 
-    start_time = time.process_time()
-    while candidates:
-        candidate = candidates.popleft()
-        if time.process_time() - start_time > options.invariant_generation_max_time:
-            print("Time limit reached, aborting invariant generation")
-            return
-        if candidate.check_balance(balance_checker, enqueue_func):
-            yield candidate
+    pool = tools.get_worker_pool(options.jobs)
+    if pool is None:
+        start_time = time.process_time()
+        while candidates:
+            candidate = candidates.popleft()
+            if time.process_time() - start_time > options.invariant_generation_max_time:
+                print("Time limit reached, aborting invariant generation")
+                return invariants, False
+            if candidate.check_balance(balance_checker, enqueue_func):
+                invariants.append(candidate)
+        return invariants, True
+
+    # With several jobs, the workers check the candidates at the front of
+    # the queue in batches. The check of a candidate only depends on the
+    # candidate, and refined candidates are only appended to the queue,
+    # so enqueueing the refinements of the batch in order leads to the
+    # same candidates and invariants as checking them one at a time. The
+    # time limit applies to the wall-clock time here because the checks
+    # run in the workers.
+    batch_size = options.jobs * 8
+    with pool:
+        start_time = time.perf_counter()
+        while candidates:
+            if time.perf_counter() - start_time > options.invariant_generation_max_time:
+                print("Time limit reached, aborting invariant generation")
+                return invariants, False
+            batch = [candidates.popleft()
+                     for _ in range(min(batch_size, len(candidates)))]
+            results = pool.map(_check_candidate, batch)
+            for candidate, (balanced, refined_candidates, num_hits,
+                            num_misses) in zip(batch, results):
+                balance_checker.num_memo_hits += num_hits
+                balance_checker.num_memo_misses += num_misses
+                for refined_candidate in refined_candidates:
+                    enqueue_func(refined_candidate)
+                if balanced:
+                    invariants.append(candidate)
+    return invariants, True
+
+def get_cache_description(task, balance_checker):
+    # The invariants only depend on the fluent predicates, on the actions
+    # with the inequality preconditions added by the balance checker and
+    # on the candidate limit, so the description covers exactly these.
+    lines = ["max candidates: %d" % options.invariant_generation_max_candidates]
+    for predicate in get_fluents(task):
+        lines.append("fluent: %s" % predicate)
+    for action in balance_checker.action_to_heavy_action:
+        lines.append("action: %s(%s)" % (
+            action.name, ", ".join(map(str, action.parameters))))
+        lines.append("precondition: %s" % action.precondition)
+        for effect in action.effects:
+            lines.append("effect: %s" % effect)
+    return "\n".join(lines)
+
+def find_invariants_with_cache(task, balance_checker, cache_dir):
+    # We import the cache module only on demand for the same reason as the
+    # domain cache module (see pddl_parser.pddl_file).
+    import invariant_cache
+    cache_file = invariant_cache.get_cache_file(
+        cache_dir, get_cache_description(task, balance_checker))
+    invariants = invariant_cache.load(cache_file)
+    if invariants is not None:
+        print("Loaded %d invariants from cache file %s" % (
+            len(invariants), cache_file))
+        return invariants
+    invariants, complete = search_invariants(task, balance_checker)
+    # Invariants from an aborted search may be incomplete, and a later
+    # run might have more time to find the missing ones.
+    if complete:
+        invariant_cache.store(cache_file, invariants)
+    return invariants
 
 def useful_groups(invariants, initial_facts):
     predicate_to_invariants = defaultdict(list)
@@ -144,7 +270,12 @@ def useful_groups(invariants, initial_facts):
 # returns a list of mutex groups (parameters instantiated, counted variables not)
 def get_groups(task, reachable_action_params=None) -> List[List[pddl.Atom]]:
     with timers.timing("Finding invariants", block=True):
-        invariants = list(find_invariants(task, reachable_action_params))
+        balance_checker = BalanceChecker(task, reachable_action_params)
+        if options.invariant_cache is None:
+            invariants, _ = search_invariants(task, balance_checker)
+        else:
+            invariants = find_invariants_with_cache(
+                task, balance_checker, options.invariant_cache)
     with timers.timing("Checking invariant weight"):
         result = list(useful_groups(invariants, task.init))
     return result
@@ -1,5 +1,6 @@
 from collections import defaultdict
 import itertools
+import random
 
 import constraints
 import pddl
@@ -327,23 +328,43 @@ class Invariant:
                 actions_to_check[a] = True
 
         actions = list(actions_to_check.keys())
+        # We seed the random number generator with the candidate, so that
+        # the outcome of the check (including the refined candidates) only
+        # depends on the candidate and not on the checks before it. This
+        # allows checking candidates in parallel.
+        rng = random.Random("%d %s" % (balance_checker.random_seed, self))
         while actions:
             # For a better expected perfomance, we want to randomize the order
             # in which actions are checked. Since candidates are often already
             # discarded by an early check, we do not want to shuffle the order
             # but instead always draw the next action randomly from those we
             # did not yet consider.
-            pos = balance_checker.random.randrange(len(actions))
+            pos = rng.randrange(len(actions))
             actions[pos], actions[-1] = actions[-1], actions[pos]
             action = actions.pop()
-            heavy_action = balance_checker.get_heavy_action(action)
-            if self._operator_too_heavy(heavy_action):
+            if self._operator_too_heavy(balance_checker, action):
                 return False
-            if self._operator_unbalanced(action, enqueue_func):
+            if self._operator_unbalanced(balance_checker, action,
+                                         enqueue_func):
                 return False
         return True
 
-    def _operator_too_heavy(self, h_action):
+    def _get_parts_for(self, predicates):
+        return frozenset(part for part in self.parts
+                         if part.predicate in predicates)
+
+    def _operator_too_heavy(self, balance_checker, action):
+        # Whether the action is too heavy only depends on the parts for the
+        # predicates of its add effects, so refined candidates can often
+        # reuse the verdict for their parent.
+        key = (action, self._get_parts_for(
+            balance_checker.get_add_predicates(action)))
+        return balance_checker.memoize(
+            balance_checker.too_heavy_verdicts, key,
+            lambda: self._heavy_operator_too_heavy(
+                balance_checker.get_heavy_action(action)))
+
+    def _heavy_operator_too_heavy(self, h_action):
         add_effects = [eff for eff in h_action.effects
                        if not eff.literal.negated and
                        self.predicate_to_part.get(eff.literal.predicate)]
@@ -365,7 +386,22 @@ class Invariant:
                 return True
         return False
 
-    def _operator_unbalanced(self, action, enqueue_func):
+    def _operator_unbalanced(self, balance_checker, action, enqueue_func):
+        # Which add effect is unbalanced only depends on the parts for the
+        # predicates of the effects. The refined candidates depend on all
+        # parts, so we do not memoize them.
+        key = (action, self._get_parts_for(
+            balance_checker.get_effect_predicates(action)))
+        add_effect = balance_checker.memoize(
+            balance_checker.unbalanced_add_effects, key,
+            lambda: self._get_unbalanced_add_effect(action))
+        if add_effect is None:
+            return False
+        # The balance check failed => Generate new candidates.
+        self._refine_candidate(add_effect, action, enqueue_func)
+        return True
+
+    def _get_unbalanced_add_effect(self, action):
         relevant_effs = [eff for eff in action.effects
                          if self.predicate_to_part.get(eff.literal.predicate)]
         add_effects = [eff for eff in relevant_effs
@@ -373,13 +409,11 @@ class Invariant:
         del_effects = [eff for eff in relevant_effs
                        if eff.literal.negated]
         for eff in add_effects:
-            if self._add_effect_unbalanced(action, eff, del_effects,
-                                           enqueue_func):
-                return True
-        return False
+            if self._add_effect_unbalanced(action, eff, del_effects):
+                return eff
+        return None
 
-    def _add_effect_unbalanced(self, action, add_effect, del_effects,
-                               enqueue_func):
+    def _add_effect_unbalanced(self, action, add_effect, del_effects):
         # We build for every delete effect that is possibly covered by this
         # invariant a constraint system that will be solvable if the delete
         # effect balances the add effect. Large parts of the constraint system
@@ -439,9 +473,6 @@ class Invariant:
                               add_effect_produced_by_pred, add_cover,
                               param_system):
                 return False
-
-        # The balance check failed => Generate new candidates.
-        self._refine_candidate(add_effect, action, enqueue_func)
         return True
 
     def _refine_candidate(self, add_effect, action, enqueue_func):
@@ -1,6 +1,7 @@
 #! /usr/bin/env python3
 
 import copy
+import sys
 from typing import Sequence
 
 import pddl
@@ -131,7 +132,7 @@ def get_axiom_predicate(axiom):
     return pddl.Atom(name, variables)
 
 def get_pne_definition_predicate(pne: pddl.PrimitiveNumericExpression):
-    return pddl.Atom(f"@def-{pne.symbol}", pne.args)
+    return pddl.Atom(sys.intern(f"@def-{pne.symbol}"), pne.args)
 
 def all_conditions(task):
     for action in task.actions:
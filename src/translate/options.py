@@ -28,14 +28,62 @@ def parse_args():
     argparser.add_argument(
         "--sas-file", default="output.sas",
         help="path to the SAS output file (default: %(default)s)")
+    argparser.add_argument(
+        "--domain-cache", metavar="DIR",
+        help="cache parsed domains in this directory and reuse them for "
+        "subsequent translator runs with the same domain file. The "
+        "directory can be shared by concurrent translator runs.")
     argparser.add_argument(
         "--invariant-generation-max-time", default=300, type=int,
         help="max time for invariant generation (default: %(default)ds)")
+    argparser.add_argument(
+        "--invariant-cache", metavar="DIR",
+        help="cache the invariants found for a domain in this directory and "
+        "reuse them for subsequent translator runs on tasks for which the "
+        "invariant synthesis would consider the same actions and fluent "
+        "predicates. The directory can be shared by concurrent translator "
+        "runs.")
     argparser.add_argument(
         "--add-implied-preconditions", action="store_true",
         help="infer additional preconditions. This setting can cause a "
         "severe performance penalty due to weaker relevance analysis "
         "(see issue7).")
+    argparser.add_argument(
+        "--prune-goal-irrelevant", action="store_true",
+        help="only explore and instantiate the actions and axioms that can "
+        "contribute to reaching the goal according to a backward relevance "
+        "analysis of the lifted task. This can considerably reduce the "
+        "grounding effort for tasks with large irrelevant parts.")
+    argparser.add_argument(
+        "--grounding-size-limit", type=int, metavar="N",
+        help="estimate the number of reachable atoms, ground actions and "
+        "ground axioms before grounding the task and abort with exit code "
+        "25 if the estimate exceeds N. The estimate is based on the numbers "
+        "of facts and distinct objects in the initial state and tends to "
+        "overestimate the actual grounding size, especially for recursive "
+        "predicates.")
+    argparser.add_argument(
+        "--join-order", default="syntactic",
+        choices=["syntactic", "statistics"],
+        help="how to split the rules of the Datalog program into binary "
+        "joins. 'syntactic' first joins the conditions that share the most "
+        "variables, while 'statistics' first joins the conditions whose "
+        "join is estimated to have the fewest atoms, based on the numbers of "
+        "facts and distinct objects of the predicates in the initial state.")
+    argparser.add_argument(
+        "--datalog-evaluation", default="worklist",
+        choices=["worklist", "batched", "stratified"],
+        help="how to compute the relaxed reachable atoms and actions. "
+        "'worklist' processes one reached atom at a time, while 'batched' "
+        "uses semi-naive evaluation that processes all atoms reached in "
+        "the previous round in batches. 'stratified' processes the strongly "
+        "connected components of the predicate dependency graph one at a "
+        "time with the worklist algorithm, and independent components in "
+        "parallel if --jobs is larger than 1. All compute the same atoms.")
+    argparser.add_argument(
+        "--jobs", default=1, type=int, metavar="N",
+        help="number of worker processes for the parallel parts of the "
+        "translator (default: %(default)d)")
     argparser.add_argument(
         "--keep-unreachable-facts",
         dest="filter_unreachable_facts", action="store_false",
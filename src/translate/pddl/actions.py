@@ -114,16 +114,18 @@ class PropositionalAction:
         self.precondition = precondition
         self.add_effects = []
         self.del_effects = []
+        # Conditions are lists, so we use tuples of them to look up the
+        # add effects in a set.
+        add_effect_keys = set()
         for condition, effect in effects:
             if not effect.negated:
                 self.add_effects.append((condition, effect))
-        # Warning: This is O(N^2), could be turned into O(N).
-        # But that might actually harm performance, since there are
-        # usually few effects.
-        # TODO: Measure this in critical domains, then use sets if acceptable.
+                add_effect_keys.add((tuple(condition), effect))
         for condition, effect in effects:
-            if effect.negated and (condition, effect.negate()) not in self.add_effects:
-                self.del_effects.append((condition, effect.negate()))
+            if effect.negated:
+                atom = effect.negate()
+                if (tuple(condition), atom) not in add_effect_keys:
+                    self.del_effects.append((condition, atom))
         self.cost = cost
 
     def __repr__(self):
@@ -1,3 +1,4 @@
+import sys
 from typing import List
 
 from .pddl_types import TypedObject
@@ -7,19 +8,49 @@ from .pddl_types import TypedObject
 # based on a precomputed hash value.
 #
 # Careful: Most other classes (e.g. Effects, Axioms, Actions) are not!
+#
+# All condition classes define __slots__, so that their instances do not
+# need a __dict__. This matters for the many ground literals created
+# during instantiation.
+
+# Optional interning table for literals, see set_literal_table.
+_literal_table = None
+
+def set_literal_table(table):
+    """Set a dictionary that maps literals to their canonical object, or
+    None. While a table is set, the ground literals created by
+    instantiate(), negate() and positive() are looked up in the table and
+    added to it if they are not in it yet. Equal literals then share one
+    object, which saves memory and speeds up equality tests, because
+    these first compare objects by identity."""
+    global _literal_table
+    _literal_table = table
+
+def intern_literal(literal):
+    if _literal_table is None:
+        return literal
+    return _literal_table.setdefault(literal, literal)
 
 class Condition:
+    __slots__ = ["parts", "hash"]
     def __init__(self, parts: List["Condition"]):
         self.parts = tuple(parts)
         self.hash = hash((self.__class__, self.parts))
     def __hash__(self):
         return self.hash
+    def __reduce__(self):
+        # The precomputed hash value is only valid within the current
+        # process, so we recompute it when unpickling.
+        return (self.__class__, (self.parts,))
     def __ne__(self, other):
         return not self == other
     def __lt__(self, other):
         return self.hash < other.hash
     def __le__(self, other):
         return self.hash <= other.hash
+    def __str__(self):
+        return "%s(%s)" % (self.__class__.__name__,
+                           ", ".join(map(str, self.parts)))
     def dump(self, indent="  "):
         print("%s%s" % (indent, self._dump()))
         for part in self.parts:
@@ -76,9 +107,12 @@ class Condition:
 class ConstantCondition(Condition):
     # Defining __eq__ blocks inheritance of __hash__, so must set it explicitly.
     __hash__ = Condition.__hash__
+    __slots__ = []
     parts = ()
     def __init__(self):
         self.hash = hash(self.__class__)
+    def __reduce__(self):
+        return (self.__class__, ())
     def change_parts(self, parts):
         return self
     def __eq__(self, other):
@@ -88,12 +122,14 @@ class Impossible(Exception):
     pass
 
 class Falsity(ConstantCondition):
+    __slots__ = []
     def instantiate(self, var_mapping, init_facts, fluent_facts, result):
         raise Impossible()
     def negate(self):
         return Truth()
 
 class Truth(ConstantCondition):
+    __slots__ = []
     def to_untyped_strips(self):
         return []
     def instantiate(self, var_mapping, init_facts, fluent_facts, result):
@@ -104,6 +140,7 @@ class Truth(ConstantCondition):
 class JunctorCondition(Condition):
     # Defining __eq__ blocks inheritance of __hash__, so must set it explicitly.
     __hash__ = Condition.__hash__
+    __slots__ = []
     def __eq__(self, other):
         # Compare hash first for speed reasons.
         return (self.hash == other.hash and
@@ -113,6 +150,7 @@ class JunctorCondition(Condition):
         return self.__class__(parts)
 
 class Conjunction(JunctorCondition):
+    __slots__ = []
     def _simplified(self, parts):
         result_parts = []
         for part in parts:
@@ -140,6 +178,7 @@ class Conjunction(JunctorCondition):
         return Disjunction([p.negate() for p in self.parts])
 
 class Disjunction(JunctorCondition):
+    __slots__ = []
     def _simplified(self, parts):
         result_parts = []
         for part in parts:
@@ -162,12 +201,19 @@ class Disjunction(JunctorCondition):
 class QuantifiedCondition(Condition):
     # Defining __eq__ blocks inheritance of __hash__, so must set it explicitly.
     __hash__ = Condition.__hash__
+    __slots__ = ["parameters"]
     def __init__(self, parameters: List[TypedObject],
                  parts: List[Condition]) -> None:
         assert len(parts) == 1
         self.parameters = tuple(parameters)
         self.parts = tuple(parts)
         self.hash = hash((self.__class__, self.parameters, self.parts))
+    def __reduce__(self):
+        return (self.__class__, (self.parameters, self.parts))
+    def __str__(self):
+        return "%s(%s; %s)" % (self.__class__.__name__,
+                               ", ".join(map(str, self.parameters)),
+                               ", ".join(map(str, self.parts)))
     def __eq__(self, other):
         # Compare hash first for speed reasons.
         return (self.hash == other.hash and
@@ -199,6 +245,7 @@ class QuantifiedCondition(Condition):
         return self.__class__(self.parameters, parts)
 
 class UniversalCondition(QuantifiedCondition):
+    __slots__ = []
     def _untyped(self, parts):
         type_literals = [par.get_atom().negate() for par in self.parameters]
         return UniversalCondition(self.parameters,
@@ -209,6 +256,7 @@ class UniversalCondition(QuantifiedCondition):
         return True
 
 class ExistentialCondition(QuantifiedCondition):
+    __slots__ = []
     def _untyped(self, parts):
         type_literals = [par.get_atom() for par in self.parameters]
         return ExistentialCondition(self.parameters,
@@ -224,12 +272,14 @@ class ExistentialCondition(QuantifiedCondition):
 class Literal(Condition):
     # Defining __eq__ blocks inheritance of __hash__, so must set it explicitly.
     __hash__ = Condition.__hash__
+    __slots__ = ["predicate", "args"]
     parts = []
-    __slots__ = ["predicate", "args", "hash"]
     def __init__(self, predicate: str, args: List[str]) -> None:
         self.predicate = predicate
         self.args = tuple(args)
         self.hash = hash((self.__class__, self.predicate, self.args))
+    def __reduce__(self):
+        return (_unpickle_literal, (self.__class__, self.predicate, self.args))
     def __eq__(self, other):
         # Compare hash first for speed reasons.
         return (self.hash == other.hash and
@@ -266,33 +316,52 @@ class Literal(Condition):
     def free_variables(self):
         return {arg for arg in self.args if arg[0] == "?"}
 
+def _unpickle_literal(cls, predicate, args):
+    # The parser interns the names of the task (see
+    # pddl_parser.parsing_functions), but unpickled strings are new
+    # objects, so we intern them again.
+    if isinstance(predicate, str):
+        predicate = sys.intern(predicate)
+    return cls(predicate, [sys.intern(arg) for arg in args])
+
 class Atom(Literal):
+    __slots__ = []
     negated = False
     def to_untyped_strips(self):
         return [self]
     def instantiate(self, var_mapping, init_facts, fluent_facts, result):
         args = [var_mapping.get(arg, arg) for arg in self.args]
+        if self.predicate == "=":
+            # Equality is built in rather than part of the initial state.
+            if args[0] != args[1]:
+                raise Impossible()
+            return
         atom = Atom(self.predicate, args)
         if atom in fluent_facts:
-            result.append(atom)
+            result.append(intern_literal(atom))
         elif atom not in init_facts:
             raise Impossible()
     def negate(self):
-        return NegatedAtom(self.predicate, self.args)
+        return intern_literal(NegatedAtom(self.predicate, self.args))
     def positive(self):
         return self
 
 class NegatedAtom(Literal):
+    __slots__ = []
     negated = True
     def _relaxed(self, parts):
         return Truth()
     def instantiate(self, var_mapping, init_facts, fluent_facts, result):
         args = [var_mapping.get(arg, arg) for arg in self.args]
+        if self.predicate == "=":
+            if args[0] == args[1]:
+                raise Impossible()
+            return
         atom = Atom(self.predicate, args)
         if atom in fluent_facts:
-            result.append(NegatedAtom(self.predicate, args))
+            result.append(intern_literal(NegatedAtom(self.predicate, args)))
         elif atom in init_facts:
             raise Impossible()
     def negate(self):
-        return Atom(self.predicate, self.args)
+        return intern_literal(Atom(self.predicate, self.args))
     positive = negate
@@ -1,3 +1,4 @@
+import itertools
 from typing import Iterable, List, Union
 
 from . import conditions
@@ -9,14 +10,9 @@ AnyEffect = Union["ConditionalEffect", "ConjunctiveEffect", "UniversalEffect",
                   "SimpleEffect", "CostEffect"]
 
 def cartesian_product(*sequences):
-    # TODO: Also exists in tools.py outside the pddl package (defined slightly
-    #       differently). Not good. Need proper import paths.
-    if not sequences:
-        yield ()
-    else:
-        for tup in cartesian_product(*sequences[1:]):
-            for item in sequences[0]:
-                yield (item,) + tup
+    # The first sequence varies fastest, unlike in itertools.product.
+    for tup in itertools.product(*reversed(sequences)):
+        yield tup[::-1]
 
 
 class Effect:
@@ -30,6 +26,9 @@ class Effect:
                 self.parameters == other.parameters and
                 self.condition == other.condition and
                 self.literal == other.literal)
+    def __str__(self):
+        return "forall(%s) if %s then %s" % (
+            ", ".join(map(str, self.parameters)), self.condition, self.literal)
     def dump(self):
         indent = "  "
         if self.parameters:
@@ -53,14 +52,46 @@ class Effect:
                     objects_by_type, result):
         if self.parameters:
             var_mapping = var_mapping.copy() # Will modify this.
-            object_lists = [objects_by_type.get(par.type_name, [])
-                            for par in self.parameters]
+            object_lists = [
+                self._get_candidate_objects(
+                    par, objects_by_type.get(par.type_name, []),
+                    var_mapping, init_facts, fluent_facts)
+                for par in self.parameters]
             for object_tuple in cartesian_product(*object_lists):
                 for (par, obj) in zip(self.parameters, object_tuple):
                     var_mapping[par.name] = obj
                 self._instantiate(var_mapping, init_facts, fluent_facts, result)
         else:
             self._instantiate(var_mapping, init_facts, fluent_facts, result)
+    def _get_candidate_objects(self, parameter, objects, var_mapping,
+                               init_facts, fluent_facts):
+        # Filter out the objects for which a positive literal of the
+        # condition that only depends on this parameter is false, so that
+        # we don't enumerate combinations with them.
+        if isinstance(self.condition, conditions.Conjunction):
+            literals = self.condition.parts
+        else:
+            literals = [self.condition]
+        other_parameters = {par.name for par in self.parameters
+                            if par.name != parameter.name}
+        for literal in literals:
+            if (not isinstance(literal, conditions.Atom) or
+                    literal.predicate == "=" or
+                    parameter.name not in literal.args or
+                    any(arg in other_parameters for arg in literal.args)):
+                continue
+            args = [var_mapping.get(arg, arg) for arg in literal.args]
+            positions = [pos for pos, arg in enumerate(literal.args)
+                         if arg == parameter.name]
+            candidates = []
+            for obj in objects:
+                for pos in positions:
+                    args[pos] = obj
+                atom = conditions.Atom(literal.predicate, args)
+                if atom in fluent_facts or atom in init_facts:
+                    candidates.append(obj)
+            objects = candidates
+        return objects
     def _instantiate(self, var_mapping, init_facts, fluent_facts, result):
         condition = []
         try:
@@ -35,6 +35,10 @@ class PrimitiveNumericExpression(FunctionalExpression):
         self.hash = hash((self.__class__, self.symbol, self.args))
     def __hash__(self):
         return self.hash
+    def __reduce__(self):
+        # The precomputed hash value is only valid within the current
+        # process, so we recompute it when unpickling.
+        return (self.__class__, (self.symbol, self.args))
     def __eq__(self, other):
         return (self.__class__ == other.__class__ and self.symbol == other.symbol
                 and self.args == other.args)
@@ -3,6 +3,7 @@
 # imports as a better solution.
 
 import itertools
+import sys
 
 
 def _get_type_predicate_name(type_name):
@@ -14,7 +15,7 @@ def _get_type_predicate_name(type_name):
     # We internally give types predicate names that cannot be confused
     # with non-type predicates. When the input uses a PDDL type as a
     # predicate, we automatically map it to this internal name.
-    return "type@%s" % type_name
+    return sys.intern("type@%s" % type_name)
 
 
 class Type:
@@ -28,6 +29,13 @@ class Type:
     def __repr__(self):
         return "Type(%s, %s)" % (self.name, self.basetype_name)
 
+    def __setstate__(self, state):
+        # Intern the names again after unpickling, see Literal.__reduce__.
+        self.__dict__.update(state)
+        self.name = sys.intern(self.name)
+        if self.basetype_name is not None:
+            self.basetype_name = sys.intern(self.basetype_name)
+
     def get_predicate_name(self):
         return _get_type_predicate_name(self.name)
 
@@ -52,12 +60,17 @@ class TypedObject:
     def __repr__(self):
         return "<TypedObject %s: %s>" % (self.name, self.type_name)
 
+    def __setstate__(self, state):
+        # Intern the name again after unpickling, see Literal.__reduce__.
+        self.__dict__.update(state)
+        self.name = sys.intern(self.name)
+
     def uniquify_name(self, type_map, renamings):
         if self.name not in type_map:
             type_map[self.name] = self.type_name
             return self
         for counter in itertools.count(1):
-            new_name = self.name + str(counter)
+            new_name = sys.intern(self.name + str(counter))
             if new_name not in type_map:
                 renamings[self.name] = new_name
                 type_map[new_name] = self.type_name
@@ -1,3 +1,4 @@
+import sys
 from typing import List
 
 from .pddl_types import TypedObject
@@ -10,5 +11,10 @@ class Predicate:
     def __str__(self):
         return "%s(%s)" % (self.name, ", ".join(map(str, self.arguments)))
 
+    def __setstate__(self, state):
+        # Intern the name again after unpickling, see Literal.__reduce__.
+        self.__dict__.update(state)
+        self.name = sys.intern(self.name)
+
     def get_arity(self):
         return len(self.arguments)
@@ -0,0 +1,58 @@
+import contextlib
+import sys
+
+import disk_cache
+
+from . import parsing_functions
+
+# Parsed domains are cached on disk, keyed by a hash of the domain file
+# contents and of the translator itself (see disk_cache). Along with the
+# domain, we store the warnings that parsing it printed and whether the
+# parser has already warned about a name clash between a type and a
+# predicate, so that the output of a translator run does not depend on
+# whether the domain was loaded from the cache.
+
+
+class _MessageRecorder:
+    # Write the text to the given stream and remember it for replaying.
+    def __init__(self, stream_name, messages):
+        self.stream_name = stream_name
+        self.stream = getattr(sys, stream_name)
+        self.messages = messages
+
+    def write(self, text):
+        self.messages.append((self.stream_name, text))
+        return self.stream.write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+def parse_domain(domain_pddl):
+    """Parse the domain and return a cache entry for it."""
+    messages = []
+    with contextlib.redirect_stdout(_MessageRecorder("stdout", messages)), \
+            contextlib.redirect_stderr(_MessageRecorder("stderr", messages)):
+        domain = parsing_functions.parse_domain(domain_pddl)
+    return (domain, messages,
+            parsing_functions.SEEN_WARNING_TYPE_PREDICATE_NAME_CLASH)
+
+
+def replay_messages(entry):
+    _, messages, seen_name_clash = entry
+    for stream_name, text in messages:
+        getattr(sys, stream_name).write(text)
+    if seen_name_clash:
+        parsing_functions.SEEN_WARNING_TYPE_PREDICATE_NAME_CLASH = True
+
+
+def get_cache_file(cache_dir, domain_buffer):
+    return disk_cache.get_cache_file(cache_dir, "domain", domain_buffer)
+
+
+def load(cache_file):
+    return disk_cache.load(cache_file, "domain")
+
+
+def store(cache_file, entry):
+    disk_cache.store(cache_file, entry, "domain")
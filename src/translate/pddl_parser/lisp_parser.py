@@ -1,41 +1,100 @@
 __all__ = ["parse_nested_list"]
 
+import io
+import re
+
 from .parse_error import ParseError
 
+# A comment extends from ";" to the end of the line.
+COMMENT_RE = re.compile(rb";[^\r\n]*")
+
+NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+
+# The tokenizer copies the input in chunks of (roughly) this many bytes.
+CHUNK_SIZE = 1 << 20
+
 # Basic functions for parsing PDDL (Lisp) files.
-def parse_nested_list(input_file):
-    tokens = tokenize(input_file)
-    next_token = next(tokens)
+def parse_nested_list(buffer):
+    tokens = tokenize(buffer)
+    next_token = next(tokens, None)
     if next_token != "(":
         raise ParseError(f"Expected '(', got '{next_token}'.")
-    result = list(parse_list_aux(tokens))
+    result = parse_list(tokens)
     remaining_tokens = list(tokens)
     if remaining_tokens:
         raise ParseError(f"Tokens remaining after parsing: "
                          f"{' '.join(remaining_tokens)}")
     return result
 
-def tokenize(input):
-    for line in input:
+def tokenize(buffer):
+    # The buffer holds the raw bytes of the input, e.g. a memory-mapped
+    # file. We tokenize it lazily in chunks of whole lines: for every
+    # chunk, we strip all comments, check that the rest is ASCII, and
+    # split the lower-cased text into tokens. Parentheses are tokens of
+    # their own and "?" always starts a new token. Since neither tokens
+    # nor comments extend over line breaks, this gives the same tokens as
+    # processing the input line by line, while only a chunk of the input
+    # is copied at any time. Like a line-based tokenizer, we yield all
+    # tokens of the lines before the first non-ASCII character and only
+    # then report it, so that earlier syntax errors take precedence.
+    for chunk in _split_into_chunks(buffer):
+        text = COMMENT_RE.sub(b"", chunk)
+        if not text.isascii():
+            offset = NON_ASCII_RE.search(text).start()
+            line_start = max(text.rfind(b"\n", 0, offset),
+                             text.rfind(b"\r", 0, offset)) + 1
+            yield from _split_into_tokens(text[:line_start])
+            _raise_non_ascii_error(buffer)
+        yield from _split_into_tokens(text)
+
+def _split_into_tokens(text):
+    return text.lower().replace(
+        b"(", b" ( ").replace(b")", b" ) ").replace(b"?", b" ?").decode(
+            "ascii").split()
+
+def _split_into_chunks(buffer):
+    # Yield consecutive pieces of the buffer of about CHUNK_SIZE bytes
+    # that end with a line break (except for the last one).
+    start = 0
+    while start < len(buffer):
+        end = start + CHUNK_SIZE
+        if end >= len(buffer):
+            end = len(buffer)
+        else:
+            line_end = buffer.rfind(b"\n", start, end)
+            if line_end == -1:
+                line_end = buffer.find(b"\n", end)
+            end = len(buffer) if line_end == -1 else line_end + 1
+        yield buffer[start:end]
+        start = end
+
+def _raise_non_ascii_error(buffer):
+    # Report the first offending line in the same way as a line-based
+    # tokenizer would. We use the Latin-1 encoding (which allows a
+    # superset of ASCII, of the Latin-* encodings and of UTF-8) because
+    # any byte sequence can be decoded with it.
+    for line in io.TextIOWrapper(io.BytesIO(buffer), encoding="ISO-8859-1"):
         line = line.split(";", 1)[0]  # Strip comments.
-        try:
-            line.encode("ascii")
-        except UnicodeEncodeError:
+        if not line.isascii():
             raise ParseError(f"Non-ASCII character outside comment: {line[0:-1]}")
-        line = line.replace("(", " ( ").replace(")", " ) ").replace("?", " ?")
-        for token in line.split():
-            yield token.lower()
-
-def parse_list_aux(tokenstream):
-    # Leading "(" has already been swallowed.
-    while True:
-        try:
-            token = next(tokenstream)
-        except StopIteration:
-            raise ParseError("Missing ')'")
-        if token == ")":
-            return
-        elif token == "(":
-            yield list(parse_list_aux(tokenstream))
+    assert False, "expected a non-ASCII character"
+
+def parse_list(tokenstream):
+    # Leading "(" has already been swallowed. We keep the enclosing lists
+    # on an explicit stack rather than recursing for every sublist, so
+    # that deeply nested input cannot exceed the recursion limit.
+    result = []
+    enclosing_lists = []
+    for token in tokenstream:
+        if token == "(":
+            sublist = []
+            result.append(sublist)
+            enclosing_lists.append(result)
+            result = sublist
+        elif token == ")":
+            if not enclosing_lists:
+                return result
+            result = enclosing_lists.pop()
         else:
-            yield token
+            result.append(token)
+    raise ParseError("Missing ')'")
@@ -87,11 +87,16 @@ def assert_named_block(context, alist, names):
     if not check_named_block(alist, names):
         context.expected_named_block_error(alist, names)
 
+# The names of objects, variables, types and predicates are interned where
+# they enter the task, so all occurrences of the same name share one string
+# object. This saves memory and lets the equality tests in the dictionaries
+# and sets of later translator stages succeed by identity.
+
 def construct_typed_object(context, name, _type):
     with context.layer("Parsing typed object"):
         if not isinstance(name, str):
             context.expected_word_error("Name of typed object", name)
-        return pddl.TypedObject(name, _type)
+        return pddl.TypedObject(sys.intern(name), _type)
 
 
 def construct_type(context, curr_type, base_type):
@@ -100,7 +105,7 @@ def construct_type(context, curr_type, base_type):
             context.expected_word_error("PDDL type", curr_type)
         if not isinstance(base_type, str):
             context.expected_word_error("Base type", base_type)
-        return pddl.Type(curr_type, base_type)
+        return pddl.Type(sys.intern(curr_type), sys.intern(base_type))
 
 
 def parse_typed_list(context, alist, only_variables=False,
@@ -174,7 +179,7 @@ def parse_predicate(context, alist):
             context.expected_word_error("Predicate name", name)
     with context.layer(f"Parsing arguments of predicate '{name}'"):
         arguments = parse_typed_list(context, alist[1:], only_variables=True)
-    return pddl.Predicate(name, arguments)
+    return pddl.Predicate(sys.intern(name), arguments)
 
 
 def parse_predicates(context, alist):
@@ -299,10 +304,11 @@ def parse_literal(context, alist, type_dict, predicate_dict, negated=False):
             context.error(f"Predicate '{predicate_name}' of arity {arity} used"
                           f" with {len(alist) - 1} arguments.", alist)
 
+        args = [sys.intern(arg) for arg in alist[1:]]
         if negated:
-            return pddl.NegatedAtom(pred_id, alist[1:])
+            return pddl.NegatedAtom(pred_id, args)
         else:
-            return pddl.Atom(pred_id, alist[1:])
+            return pddl.Atom(pred_id, args)
 
 
 SEEN_WARNING_TYPE_PREDICATE_NAME_CLASH = False
@@ -571,6 +577,9 @@ def parse_axioms_and_actions(context, entries, type_dict, predicate_dict):
                         the_actions.append(action)
     return the_axioms, the_actions
 
+def parse_init_atom(fact):
+    return pddl.Atom(sys.intern(fact[0]), [sys.intern(arg) for arg in fact[1:]])
+
 def parse_init(context, alist):
     initial = []
     initial_proposition_values = dict()
@@ -609,12 +618,12 @@ def parse_init(context, alist):
                 fact = fact[1]
                 if not isinstance(fact, list) or not fact:
                     context.error("Invalid negated fact.", syntax=SYNTAX_LITERAL_NEGATED)
-                atom = pddl.Atom(fact[0], fact[1:])
+                atom = parse_init_atom(fact)
                 check_atom_consistency(context, atom,
                                        initial_proposition_values, False)
                 initial_proposition_values[atom] = False
             else:
-                atom = pddl.Atom(fact[0], fact[1:])
+                atom = parse_init_atom(fact)
                 check_atom_consistency(context, atom,
                                        initial_proposition_values, True)
                 initial_proposition_values[atom] = True
@@ -624,11 +633,22 @@ def parse_init(context, alist):
 
 
 def parse_task(domain_pddl, task_pddl):
+    return parse_task_for_domain(parse_domain(domain_pddl), task_pddl)
+
+
+def parse_domain(domain_pddl):
+    """Return the parsed components of the domain as a tuple that can be
+    passed to parse_task_for_domain."""
     context = Context()
     if not isinstance(domain_pddl, list):
         context.error("Invalid definition of a PDDL domain.")
+    return tuple(parse_domain_pddl(context, domain_pddl))
+
+
+def parse_task_for_domain(domain, task_pddl):
+    context = Context()
     domain_name, domain_requirements, types, type_dict, constants, predicates, \
-        predicate_dict, functions, actions, axioms = parse_domain_pddl(context, domain_pddl)
+        predicate_dict, functions, actions, axioms = domain
     if not isinstance(task_pddl, list):
         context.error("Invalid definition of a PDDL task.")
     task_name, task_domain_name, task_requirements, objects, init, goal, \
@@ -647,7 +667,6 @@ def parse_task(domain_pddl, task_pddl):
         [o.name for o in objects],
         errmsg="error: duplicate object %r",
         finalmsg="please check :constants and :objects definitions")
-    init += [pddl.Atom("=", (obj.name, obj.name)) for obj in objects]
 
     return pddl.Task(
         domain_name, task_name, requirements, types, objects,
@@ -1,3 +1,6 @@
+import contextlib
+import mmap
+
 from . import lisp_parser
 from . import parse_error
 from . import parsing_functions
@@ -5,24 +8,72 @@ from . import parsing_functions
 file_open = open
 
 
+@contextlib.contextmanager
+def map_file(input_file):
+    # Memory-map the file so that tokenizing reads from the OS page cache
+    # instead of from a private copy of the whole file. Empty files and
+    # files that are not regular files (e.g. pipes) cannot be mapped, so
+    # we read them into memory instead.
+    try:
+        buffer = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        buffer = None
+    if buffer is None:
+        yield input_file.read()
+    else:
+        with buffer:
+            yield buffer
+
+
 def parse_pddl_file(type, filename):
     try:
         # The builtin open function is shadowed by this module's open function.
-        # We use the Latin-1 encoding (which allows a superset of ASCII, of the
-        # Latin-* encodings and of UTF-8) to allow special characters in
-        # comments. In all other parts, we later validate that only ASCII is
-        # used.
-        return lisp_parser.parse_nested_list(file_open(filename,
-                                                       encoding='ISO-8859-1'))
+        with file_open(filename, "rb") as input_file:
+            with map_file(input_file) as buffer:
+                return parse_pddl_buffer(type, filename, buffer)
     except OSError as e:
         raise SystemExit("Error: Could not read file: %s\nReason: %s" %
                          (e.filename, e))
+
+
+def parse_pddl_buffer(type, filename, buffer):
+    try:
+        # We parse the raw bytes of the file to allow special characters in
+        # comments. In all other parts, the parser validates that only ASCII
+        # is used.
+        return lisp_parser.parse_nested_list(buffer)
     except parse_error.ParseError as e:
         raise parse_error.ParseError("Error: Could not parse %s file: %s\nReason: %s" %
                          (type, filename, e))
 
 
-def open(domain_filename=None, task_filename=None):
+def parse_domain_file(filename, cache_dir=None):
+    if cache_dir is None:
+        return parsing_functions.parse_domain(
+            parse_pddl_file("domain", filename))
+    # We import the cache module only on demand because hashlib and
+    # tempfile noticeably increase the translator's peak memory usage.
+    from . import domain_cache
+    try:
+        with file_open(filename, "rb") as input_file:
+            with map_file(input_file) as buffer:
+                cache_file = domain_cache.get_cache_file(cache_dir, buffer)
+                entry = domain_cache.load(cache_file)
+                if entry is None:
+                    entry = domain_cache.parse_domain(
+                        parse_pddl_buffer("domain", filename, buffer))
+                    domain_cache.store(cache_file, entry)
+                else:
+                    print(f"Loaded parsed domain from cache file {cache_file}")
+                    domain_cache.replay_messages(entry)
+                domain, _, _ = entry
+                return domain
+    except OSError as e:
+        raise SystemExit("Error: Could not read file: %s\nReason: %s" %
+                         (e.filename, e))
+
+
+def open(domain_filename=None, task_filename=None, domain_cache_dir=None):
     if domain_filename is None or task_filename is None:
         # Importing options triggers parsing the problem and domain file names
         # as arguments from the command line. We don't import unconditionally
@@ -33,7 +84,7 @@ def open(domain_filename=None, task_filename=None):
         domain_filename = domain_filename or options.domain
         task_filename = task_filename or options.task
 
-    domain_pddl = parse_pddl_file("domain", domain_filename)
+    domain = parse_domain_file(domain_filename, domain_cache_dir)
     task_pddl = parse_pddl_file("task", task_filename)
 
-    return parsing_functions.parse_task(domain_pddl, task_pddl)
+    return parsing_functions.parse_task_for_domain(domain, task_pddl)
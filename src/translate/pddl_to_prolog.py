@@ -2,8 +2,11 @@
 
 
 import itertools
+import sys
+from collections import defaultdict
 
 import normalize
+import options
 import pddl
 import timers
 
@@ -14,7 +17,7 @@ class PrologProgram:
         self.objects = set()
         def predicate_name_generator():
             for count in itertools.count():
-                yield "p$%d" % count
+                yield sys.intern("p$%d" % count)
         self.new_name = predicate_name_generator()
     def add_fact(self, atom):
         self.facts.append(Fact(atom))
@@ -30,21 +33,163 @@ class PrologProgram:
         # Normalized prolog programs have the following properties:
         # 1. Each variable that occurs in the effect of a rule also occurs in its
         #    condition.
-        # 2. The variables that appear in each effect or condition are distinct.
+        # 2. There are no equality conditions. Equality is built into the
+        #    model computation: if a variable appears several times in a
+        #    condition, the condition only matches atoms with the same
+        #    object at all these positions.
         # 3. There are no rules with empty condition.
+        self.remove_equality_conditions()
         self.remove_free_effect_variables()
-        self.split_duplicate_arguments()
         self.convert_trivial_rules()
     def split_rules(self):
+        import greedy_join
         import split_rules
         # Splits rules whose conditions can be partitioned in such a way that
         # the parts have disjoint variable sets, then split n-ary joins into
         # a number of binary joins, introducing new pseudo-predicates for the
         # intermediate values.
+        # With the "statistics" join order, the binary joins are chosen
+        # based on the number of facts of each predicate.
+        statistics = None
+        if options.join_order == "statistics":
+            statistics = greedy_join.CardinalityStatistics(
+                self.facts, self.rules)
         new_rules = []
         for rule in self.rules:
-            new_rules += split_rules.split_rule(rule, self.new_name)
+            new_rules += split_rules.split_rule(
+                rule, self.new_name, statistics)
         self.rules = new_rules
+    def remove_irrelevant_rules(self, relevant_predicates):
+        """Remove the rules that cannot contribute to reaching the goal.
+        Starting from relevant_predicates, a rule is relevant if its
+        effect is relevant, and the predicates in the conditions of
+        relevant rules are relevant. The rules for the effects of a
+        relevant action are always kept, because all effects of an
+        instantiated action must be reached, but they don't make their
+        effects relevant."""
+        rules_by_effect = defaultdict(list)
+        rules_by_action = defaultdict(list)
+        for rule in self.rules:
+            rules_by_effect[rule.effect.predicate].append(rule)
+            for cond in rule.conditions:
+                if isinstance(cond.predicate, pddl.Action):
+                    rules_by_action[cond.predicate].append(rule)
+
+        relevant_predicates = set(relevant_predicates)
+        queue = list(relevant_predicates)
+        relevant_rules = set()
+        while queue:
+            predicate = queue.pop()
+            for rule in rules_by_effect[predicate] + rules_by_action[predicate]:
+                if id(rule) not in relevant_rules:
+                    relevant_rules.add(id(rule))
+                    for cond in rule.conditions:
+                        if cond.predicate not in relevant_predicates:
+                            relevant_predicates.add(cond.predicate)
+                            queue.append(cond.predicate)
+        num_rules = len(self.rules)
+        self.rules = [rule for rule in self.rules if id(rule) in relevant_rules]
+        print("Removed %d of %d rules as irrelevant for the goal." % (
+            num_rules - len(self.rules), num_rules))
+    def evaluate_static_conditions(self, initial_predicates,
+                                   kept_predicates):
+        """Join the static conditions of each rule up front, i.e., the
+        conditions on predicates that don't occur in the effect of any
+        rule. Static conditions that share variables are replaced by a
+        single condition on a new predicate, whose facts are the
+        precomputed join, projected to the variables that the rest of the
+        rule needs. Since no rule derives the new predicates,
+        build_model.compute_model adds their facts to the indexes of the
+        rules directly, without queueing them. Static conditions that are
+        unsatisfiable remove their rule. Afterwards, the facts of the predicates in
+        initial_predicates (those of the initial state and the types) that
+        are neither derived nor used by a rule nor in kept_predicates are
+        removed. Facts of other predicates, e.g. of actions, axioms or
+        @goal-reachable whose rules had an empty condition, are kept.
+        This must be called after normalizing the program."""
+        import split_rules
+        derived_predicates = {rule.effect.predicate for rule in self.rules}
+        facts_by_predicate = {}
+        for fact in self.facts:
+            facts_by_predicate.setdefault(
+                fact.atom.predicate, set()).add(fact.atom.args)
+
+        precomputed_atoms = {}
+        new_rules = []
+        for rule in self.rules:
+            static_conditions = [cond for cond in rule.conditions
+                                 if cond.predicate not in derived_predicates]
+            if not static_conditions:
+                new_rules.append(rule)
+                continue
+            # Each component of static conditions is replaced by (at most)
+            # one condition at the position of its first condition.
+            replacements = {}
+            components = split_rules.get_connected_conditions(
+                static_conditions)
+            for component in components:
+                component.sort(key=rule.conditions.index)
+                for cond in component:
+                    replacements[cond] = None
+                other_conditions = [cond for cond in rule.conditions
+                                    if cond not in component]
+                needed_vars = get_variables(other_conditions + [rule.effect])
+                component_vars = sorted(
+                    get_variables(component) & needed_vars)
+                if len(component) == 1 and component_vars:
+                    # Nothing to join: keep the condition unless it cannot
+                    # be satisfied.
+                    cond, = component
+                    if not facts_by_predicate.get(cond.predicate):
+                        break
+                    replacements[cond] = cond
+                    continue
+                key = (tuple(component), tuple(component_vars))
+                atom = precomputed_atoms.get(key)
+                if atom is None:
+                    tuples = join_static_conditions(
+                        component, facts_by_predicate, component_vars)
+                    if not tuples:
+                        atom = False
+                    elif not component_vars:
+                        atom = True
+                    else:
+                        atom = pddl.Atom(next(self.new_name), component_vars)
+                        facts_by_predicate[atom.predicate] = tuples
+                        for args in sorted(tuples):
+                            self.add_fact(pddl.Atom(atom.predicate, args))
+                    precomputed_atoms[key] = atom
+                if atom is False:
+                    break
+                elif atom is not True:
+                    replacements[component[0]] = atom
+            else:
+                new_conditions = []
+                for cond in rule.conditions:
+                    if cond not in replacements:
+                        new_conditions.append(cond)
+                    elif replacements[cond] is not None:
+                        new_conditions.append(replacements[cond])
+                if new_conditions:
+                    rule.conditions = new_conditions
+                    new_rules.append(rule)
+                else:
+                    # All conditions hold, so the effect is variable-free.
+                    assert not get_variables([rule.effect])
+                    if rule.effect.args not in facts_by_predicate.setdefault(
+                            rule.effect.predicate, set()):
+                        facts_by_predicate[rule.effect.predicate].add(
+                            rule.effect.args)
+                        self.add_fact(rule.effect)
+        self.rules = new_rules
+
+        unused_predicates = (set(initial_predicates) - set(kept_predicates) -
+                             derived_predicates)
+        for rule in self.rules:
+            unused_predicates.difference_update(
+                cond.predicate for cond in rule.conditions)
+        self.facts = [fact for fact in self.facts
+                      if fact.atom.predicate not in unused_predicates]
     def remove_free_effect_variables(self):
         """Remove free effect variables like the variable Y in the rule
         p(X, Y) :- q(X). This is done by introducing a new predicate
@@ -66,18 +211,13 @@ class PrologProgram:
         if must_add_predicate:
             print("Unbound effect variables: Adding @object predicate.")
             self.facts += [Fact(pddl.Atom("@object", [obj])) for obj in self.objects]
-    def split_duplicate_arguments(self):
-        """Make sure that no variable occurs twice within the same symbolic fact,
-        like the variable X does in p(X, Y, X). This is done by renaming the second
-        and following occurrences of the variable and adding equality conditions.
-        For example p(X, Y, X) is translated to p(X, Y, X@0) with the additional
-        condition =(X, X@0); the equality predicate must be appropriately instantiated
-        somewhere else."""
-        printed_message = False
-        for rule in self.rules:
-            if rule.rename_duplicate_variables() and not printed_message:
-                print("Duplicate arguments: Adding equality conditions.")
-                printed_message = True
+    def remove_equality_conditions(self):
+        """Remove equality conditions like =(X, Y) by renaming Y to X in
+        the rule, or both variables to the object if one of them is an
+        object. Rules that require two different objects to be equal are
+        removed."""
+        self.rules = [rule for rule in self.rules
+                      if rule.remove_equality_conditions()]
 
     def convert_trivial_rules(self):
         """Convert rules with an empty condition into facts.
@@ -102,6 +242,58 @@ def get_variables(symbolic_atoms):
         variables |= {arg for arg in sym_atom.args if arg[0] == "?"}
     return variables
 
+def join_static_conditions(conditions, facts_by_predicate, variables):
+    """Return the set of tuples of objects for the given variables that
+    satisfy all conditions, which must be connected."""
+    remaining_conditions = list(conditions)
+    bound_vars = []
+    tuples = {()}
+    while remaining_conditions and tuples:
+        # Prefer conditions that share many variables with the ones joined
+        # so far, then conditions with few facts.
+        cond = min(remaining_conditions, key=lambda cond: (
+            -len(set(cond.args) & set(bound_vars)),
+            len(facts_by_predicate.get(cond.predicate, ()))))
+        remaining_conditions.remove(cond)
+
+        # Index the facts of the condition by the objects at the positions
+        # of constants and of variables that are already bound.
+        var_positions = {var: pos for pos, var in enumerate(bound_vars)}
+        key_positions = [pos for pos, arg in enumerate(cond.args)
+                         if arg[0] != "?" or arg in var_positions]
+        new_positions = [pos for pos, arg in enumerate(cond.args)
+                         if arg[0] == "?" and arg not in var_positions and
+                         cond.args.index(arg) == pos]
+        # Further occurrences of new variables require equal objects.
+        equalities = [(cond.args.index(arg), pos)
+                      for pos, arg in enumerate(cond.args)
+                      if arg[0] == "?" and arg not in var_positions and
+                      cond.args.index(arg) != pos]
+        index = {}
+        for args in facts_by_predicate.get(cond.predicate, ()):
+            if all(args[pos1] == args[pos2] for pos1, pos2 in equalities):
+                key = tuple(args[pos] for pos in key_positions)
+                index.setdefault(key, []).append(args)
+
+        # Join, and project the result to the variables still needed.
+        key_args = [cond.args[pos] for pos in key_positions]
+        joined_vars = bound_vars + [cond.args[pos] for pos in new_positions]
+        needed_vars = get_variables(remaining_conditions) | set(variables)
+        bound_vars = [var for var in joined_vars if var in needed_vars]
+        projection = [joined_vars.index(var) for var in bound_vars]
+        new_tuples = set()
+        for values in tuples:
+            key = tuple(values[var_positions[arg]] if arg in var_positions
+                        else arg for arg in key_args)
+            for args in index.get(key, ()):
+                joined = values + tuple(args[pos] for pos in new_positions)
+                new_tuples.add(tuple(joined[pos] for pos in projection))
+        tuples = new_tuples
+    if not tuples:
+        return tuples
+    projection = [bound_vars.index(var) for var in variables]
+    return {tuple(values[pos] for pos in projection) for values in tuples}
+
 class Fact:
     def __init__(self, atom):
         self.atom = atom
@@ -116,28 +308,34 @@ class Rule:
         self.conditions.append(condition)
     def get_variables(self):
         return get_variables(self.conditions + [self.effect])
-    def _rename_duplicate_variables(self, atom, new_conditions):
-        used_variables = set()
-        for i, var_name in enumerate(atom.args):
-            if var_name[0] == "?":
-                if var_name in used_variables:
-                    new_var_name = "%s@%d" % (var_name, len(new_conditions))
-                    atom = atom.replace_argument(i, new_var_name)
-                    new_conditions.append(pddl.Atom("=", [var_name, new_var_name]))
-                else:
-                    used_variables.add(var_name)
-        return atom
-    def rename_duplicate_variables(self):
-        extra_conditions = []
-        self.effect = self._rename_duplicate_variables(
-            self.effect, extra_conditions)
-        old_conditions = self.conditions
-        self.conditions = []
-        for condition in old_conditions:
-            self.conditions.append(self._rename_duplicate_variables(
-                    condition, extra_conditions))
-        self.conditions += extra_conditions
-        return bool(extra_conditions)
+    def remove_equality_conditions(self):
+        # Returns False if the rule can never fire.
+        renamings = {}
+        def get_representative(arg):
+            while arg in renamings:
+                arg = renamings[arg]
+            return arg
+        new_conditions = []
+        for condition in self.conditions:
+            if condition.predicate != "=":
+                new_conditions.append(condition)
+                continue
+            left, right = map(get_representative, condition.args)
+            if left == right:
+                continue
+            elif left[0] == "?":
+                renamings[left] = right
+            elif right[0] == "?":
+                renamings[right] = left
+            else:
+                return False
+        if renamings:
+            renamings = {var: get_representative(var) for var in renamings}
+            self.effect = self.effect.rename_variables(renamings)
+            new_conditions = [condition.rename_variables(renamings)
+                              for condition in new_conditions]
+        self.conditions = new_conditions
+        return True
     def __str__(self):
         cond_str = ", ".join(map(str, self.conditions))
         return "%s :- %s." % (self.effect, cond_str)
@@ -160,17 +358,89 @@ def translate_facts(prog, task):
             # fact.fluent has been defined.
             prog.add_fact(normalize.get_pne_definition_predicate(fact.fluent))
 
+def get_fluent_predicates(task):
+    # These are the predicates whose atoms the model must contain.
+    fluent_predicates = set()
+    for action in task.actions:
+        for effect in action.effects:
+            fluent_predicates.add(effect.literal.predicate)
+    for axiom in task.axioms:
+        fluent_predicates.add(axiom.name)
+    return fluent_predicates
+
+def get_initially_relevant_predicates(task):
+    """Return the predicates that are relevant for reaching the goal
+    independently of the positive conditions, which the Datalog program
+    represents. Since it ignores negative conditions, derived predicates
+    that occur in negative conditions are relevant, and so are actions
+    that delete a predicate that occurs in negative conditions. A negated
+    derived predicate becomes true when the bodies of its axioms become
+    false, so this extends (recursively) to the predicates of positive
+    literals in these bodies, while the predicates of negative literals
+    in these bodies are relevant themselves."""
+    negated_predicates = set()
+    def collect_negated_predicates(condition):
+        if isinstance(condition, pddl.NegatedAtom):
+            negated_predicates.add(condition.predicate)
+        for part in condition.parts:
+            collect_negated_predicates(part)
+    collect_negated_predicates(task.goal)
+    for action in task.actions:
+        collect_negated_predicates(action.precondition)
+        for effect in action.effects:
+            collect_negated_predicates(effect.condition)
+    for axiom in task.axioms:
+        collect_negated_predicates(axiom.condition)
+
+    result = {"@goal-reachable"}
+    axioms_by_name = defaultdict(list)
+    for axiom in task.axioms:
+        axioms_by_name[axiom.name].append(axiom)
+    def collect_body_literals(condition, literals):
+        if isinstance(condition, pddl.Literal):
+            literals.append(condition)
+        for part in condition.parts:
+            collect_body_literals(part, literals)
+        return literals
+    queue = list(negated_predicates)
+    while queue:
+        predicate = queue.pop()
+        for axiom in axioms_by_name.get(predicate, ()):
+            for literal in collect_body_literals(axiom.condition, []):
+                if literal.negated:
+                    result.add(literal.predicate)
+                elif literal.predicate not in negated_predicates:
+                    negated_predicates.add(literal.predicate)
+                    queue.append(literal.predicate)
+
+    for axiom in task.axioms:
+        if axiom.name in negated_predicates:
+            result.add(axiom.name)
+    for action in task.actions:
+        for effect in action.effects:
+            if (effect.literal.negated and
+                    effect.literal.predicate in negated_predicates):
+                result.add(action)
+    return result
+
 def translate(task):
     # Note: The function requires that the task has been normalized.
     with timers.timing("Generating Datalog program"):
         prog = PrologProgram()
         translate_facts(prog, task)
+        initial_predicates = {fact.atom.predicate for fact in prog.facts}
         for conditions, effect in normalize.build_exploration_rules(task):
             prog.add_rule(Rule(conditions, effect))
+    if options.prune_goal_irrelevant:
+        with timers.timing("Removing goal-irrelevant rules", block=True):
+            prog.remove_irrelevant_rules(
+                get_initially_relevant_predicates(task))
     with timers.timing("Normalizing Datalog program", block=True):
         # Using block=True because normalization can output some messages
         # in rare cases.
         prog.normalize()
+        prog.evaluate_static_conditions(
+            initial_predicates, get_fluent_predicates(task))
         prog.split_rules()
     return prog
 
@@ -1,3 +1,6 @@
+import multiprocessing
+
+
 def get_peak_memory_in_kb():
     try:
         # This will only work on Linux systems.
@@ -9,3 +12,28 @@ def get_peak_memory_in_kb():
     except OSError:
         pass
     raise Warning("warning: could not determine peak memory")
+
+
+def get_worker_pool(jobs):
+    """Return a pool of the given number of forked worker processes, or
+    None if jobs is at most 1 or the "fork" start method is not
+    available. The workers inherit the state of the calling process at
+    the time the pool is created."""
+    if jobs > 1 and "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork").Pool(jobs)
+    return None
+
+
+def parallel_map(function, items, jobs):
+    """Return the list of the function values for the items, computed by
+    up to the given number of forked worker processes. The function must
+    be defined at module level. Since the workers are forked, they
+    inherit the state of the calling process, which therefore does not
+    have to be passed with the items. Without the "fork" start method,
+    the values are computed in the calling process."""
+    if len(items) > 1:
+        pool = get_worker_pool(min(jobs, len(items)))
+        if pool is not None:
+            with pool:
+                return pool.map(function, items)
+    return list(map(function, items))
@@ -50,6 +50,7 @@ DEBUG = False
 ## we only list codes that are used by the translator component of the planner.
 TRANSLATE_OUT_OF_MEMORY = 20
 TRANSLATE_OUT_OF_TIME = 21
+TRANSLATE_GROUNDING_TOO_LARGE = 25
 TRANSLATE_INPUT_ERROR = 31
 
 simplified_effect_condition_counter = 0
@@ -703,7 +704,8 @@ def main():
     timer = timers.Timer()
     with timers.timing("Parsing", True):
         task = pddl_parser.open(
-            domain_filename=options.domain, task_filename=options.task)
+            domain_filename=options.domain, task_filename=options.task,
+            domain_cache_dir=options.domain_cache)
 
     with timers.timing("Normalizing task"):
         normalize.normalize(task)
@@ -753,6 +755,9 @@ if __name__ == "__main__":
         traceback.print_exc(file=sys.stdout)
         print("=" * 79)
         sys.exit(TRANSLATE_OUT_OF_MEMORY)
+    except instantiate.GroundingSizeLimitExceeded as e:
+        print(e)
+        sys.exit(TRANSLATE_GROUNDING_TOO_LARGE)
     except pddl_parser.ParseError as e:
         print(e)
         sys.exit(TRANSLATE_INPUT_ERROR)